@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import document
+
+# Headless rendering of description documents to HTML files, run through
+# "main.py render" or "python -m batch". Kept free of PyQt6 so worker
+# processes start quickly: main.py runs this module as __main__, so under
+# spawn the workers import it instead of main.py.
+
+PROGRESS_EVERY = 50
+
+
+def iter_jobs(source):
+    """ Yield (name, json_text) pairs from a directory of *.json files or a JSONL file. """
+    if os.path.isdir(source):
+        for file_name in sorted(os.listdir(source)):
+            if file_name.endswith(".json"):
+                with open(os.path.join(source, file_name), "r", encoding="utf-8") as file:
+                    yield os.path.splitext(file_name)[0], file.read()
+    else:
+        with open(source, "r", encoding="utf-8") as file:
+            for line_number, line in enumerate(file, start=1):
+                if line.strip():
+                    yield f"line-{line_number}", line
+
+
+def output_name(name, text):
+    """ Base name of the .html file for a job: the document's "name" if it has one, else the job's name. """
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return name  # reported by render_job
+    if isinstance(data, dict) and data.get("name"):
+        return os.path.basename(str(data["name"]))
+    return name
+
+
+def render_job(job):
+    """ Render one document in a worker; errors are returned so one bad file can't stop the batch. """
+    name, text, output_dir = job
+    try:
+        data = json.loads(text)
+        blocks = document.document_from_dict(data)
+        path = os.path.join(output_dir, f"{name}.html")
+        try:
+            with open(path, "w", encoding="utf-8", newline="") as file:
+                document.write_document(blocks, file)
+        except Exception:
+            # Blocks are rendered while writing; don't leave half a file behind.
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        return name, None
+    except Exception as e:
+        return name, f"{type(e).__name__}: {e}"
+
+
+def render_batch(source, output_dir, workers=None, chunksize=16, log=sys.stderr):
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    failures = []
+    # Two documents with the same output name would overwrite each other, maybe
+    # even at the same time in two workers, so only the first one is rendered.
+    # Names are compared case-insensitively, as the file systems of Windows and macOS do.
+    owners = {}
+    for job_name, text in iter_jobs(source):
+        name = output_name(job_name, text)
+        owner = owners.setdefault(name.casefold(), job_name)
+        if owner != job_name:
+            failures.append((job_name, f"output name {name!r} is already used by {owner}"))
+        else:
+            jobs.append((name, text, output_dir))
+    total = len(jobs) + len(failures)
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for done, (name, error) in enumerate(executor.map(render_job, jobs, chunksize=chunksize),
+                                             start=len(failures) + 1):
+            if error:
+                failures.append((name, error))
+            if done % PROGRESS_EVERY == 0 or done == total:
+                print(f"\r{done}/{total}", end="", file=log, flush=True)
+
+    elapsed = time.perf_counter() - started
+    if total:
+        print(file=log)
+    for name, error in failures:
+        print(f"FAILED {name}: {error}", file=log)
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f"Rendered {total - len(failures)}/{total} documents in {elapsed:.2f}s "
+          f"({rate:.1f} docs/sec), {len(failures)} failed", file=log)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="main.py render",
+        description="Render description documents to longdescription HTML files.")
+    parser.add_argument("source", help="directory of *.json documents or a JSONL file")
+    parser.add_argument("output_dir", help="directory the .html files are written to")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="worker processes (default: number of CPUs)")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.source):
+        parser.error(f"source {args.source!r} does not exist")
+    if not os.access(args.source, os.R_OK):
+        parser.error(f"source {args.source!r} is not readable")
+
+    failures = render_batch(args.source, args.output_dir, workers=args.workers)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
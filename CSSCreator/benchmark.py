@@ -0,0 +1,370 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Headless benchmarks of rendering and editor interactions. Runs the real
+# HtmlEditor on the offscreen Qt platform inside a scratch directory, so the
+# settings file, autosave journal and exported images of a real install are
+# never touched:
+#
+#   python benchmark.py -o results.json
+#   python benchmark.py --compare results.json
+#
+# Results are JSON (see write_results) so runs of different releases can be
+# compared with --compare.
+
+RESULTS_FORMAT = "longdescription-benchmark"
+RESULTS_VERSION = 1
+DEFAULT_SIZES = (10, 100, 1000)
+DEFAULT_REPEAT = 5
+INTERACTION_SECTIONS = 100
+IMAGE_SIZE = (2400, 1600)
+# --compare fails when a median gets slower than the baseline by this factor.
+DEFAULT_THRESHOLD = 1.25
+
+BLOCK_KINDS = ("section", "header", "list", "youtube")
+
+
+def measure(function, repeat, setup=None):
+    """ Seconds taken by function() in each of repeat runs, setup() running untimed before each. """
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def result(name, samples, **params):
+    return {"name": name, "params": params, "unit": "s", "samples": samples,
+            "min": min(samples), "median": statistics.median(samples), "max": max(samples)}
+
+
+def write_settings(directory):
+    # Without a settings file the editor opens the first-run theme chooser.
+    with open(os.path.join(directory, "app_settings.json"), "w") as file:
+        json.dump({"light_mode": False}, file)
+
+
+def synthetic_blocks(kind, count):
+    import document
+
+    text = ("Opis produktu z kilkoma zdaniami tekstu.\n⤷punkt listy\n⤷⤷podpunkt\n"
+            "Kolejny akapit, który zamyka sekcję.")
+    blocks = []
+    for i in range(count):
+        if kind == "section":
+            blocks.append(document.Section(f"{i}. {text}", image_first=i % 2 == 0))
+        elif kind == "header":
+            blocks.append(document.Header("h2", f"Nagłówek numer {i}"))
+        elif kind == "list":
+            blocks.append(document.List("ul", f"Wstęp {i}\n{text}"))
+        else:
+            blocks.append(document.YoutubeVideo(f"{i:011d}"))
+    return blocks
+
+
+class Bench:
+    """ One offscreen application plus helpers to open and tear down editors. """
+
+    def __init__(self, directory):
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        self.directory = directory
+        os.chdir(directory)
+
+        from PyQt6.QtCore import QCoreApplication, Qt
+        from PyQt6.QtWidgets import QApplication
+
+        import main
+
+        self.main = main
+        write_settings(directory)
+        QCoreApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
+        self.app = QApplication.instance() or QApplication([sys.argv[0]])
+
+    def open_editor(self, blocks=()):
+        editor = self.main.HtmlEditor()
+        editor.asset_store.mirror_directory = os.path.join(self.directory, "mirror")
+        editor.resize(1200, 900)
+        editor.show()
+        self.settle()  # runs restore_autosave, which finds an empty journal
+        editor.show_editor_page()
+        if blocks:
+            editor.set_blocks(list(blocks))
+        editor.flush_html()
+        self.settle()
+        return editor
+
+    def close_editor(self, editor):
+        editor.image_pipeline.shutdown()
+        editor.paste_pipeline.shutdown()
+        editor.asset_store.shutdown()
+        editor.journal.close()
+        editor.hide()
+        editor.deleteLater()
+        self.settle()
+        shutil.rmtree(os.path.join(self.directory, editor.AUTOSAVE_DIRECTORY), ignore_errors=True)
+
+    def settle(self):
+        from PyQt6.QtCore import QEvent
+
+        self.app.processEvents()
+        self.app.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+
+    def wait(self, done, timeout=60):
+        deadline = time.perf_counter() + timeout
+        while not done():
+            if time.perf_counter() > deadline:
+                raise TimeoutError("benchmark step did not finish")
+            self.app.processEvents()
+            time.sleep(0.001)
+
+
+def bench_update_html(bench, sizes, repeat):
+    results = []
+    for kind in BLOCK_KINDS:
+        for count in sizes:
+            editor = bench.open_editor(synthetic_blocks(kind, count))
+
+            def invalidate_all():
+                for section in editor.sections:
+                    editor.invalidate_section(section)
+
+            def render():
+                editor.update_html()
+                editor.flush_html()
+
+            results.append(result("update_html.full", measure(render, repeat, invalidate_all),
+                                  kind=kind, sections=count))
+
+            edited = editor.visible_sections[0]
+            edits = iter(range(repeat))
+
+            def edit_one():
+                node = edited.node
+                if kind == "youtube":
+                    edited.video_edit.setText(f"{next(edits):011d}")
+                else:
+                    edited.text_edit.setPlainText(f"{node.text} {next(edits)}")
+                editor.flush_html()
+
+            results.append(result("update_html.edit", measure(edit_one, repeat), kind=kind, sections=count))
+            bench.close_editor(editor)
+    return results
+
+
+def bench_interactions(bench, repeat):
+    from PyQt6.QtWidgets import QPushButton
+
+    blocks = [block for kind in BLOCK_KINDS for block in synthetic_blocks(kind, INTERACTION_SECTIONS // 4)]
+    editor = bench.open_editor(blocks)
+
+    def interaction(function):
+        def run():
+            function()
+            editor.flush_html()
+            bench.settle()
+        return run
+
+    add = measure(interaction(editor.add_section), repeat)
+
+    def delete_first():
+        section = editor.visible_sections[0]
+        editor.delete_section(section.id)
+        yes = next(button for button in section.row.findChildren(QPushButton) if button.text() == "Tak")
+        yes.click()
+
+    delete = measure(interaction(delete_first), repeat)
+    move = measure(interaction(lambda: editor.move_section(editor.visible_sections[1].id, -1)), repeat)
+    theme = measure(interaction(editor.toggle_light_mode), repeat)
+    bench.close_editor(editor)
+
+    sections = len(blocks)
+    return [result("add_section", add, sections=sections),
+            result("delete_section", delete, sections=sections),
+            result("move_section", move, sections=sections),
+            result("toggle_light_mode", theme, sections=sections)]
+
+
+def bench_image_import(bench, repeat):
+    from PyQt6.QtCore import QPointF
+    from PyQt6.QtGui import QColor, QImage, QLinearGradient, QPainter
+
+    # A distinct image per run; identical ones would hit the content-addressed store.
+    paths = []
+    for i in range(repeat):
+        image = QImage(*IMAGE_SIZE, QImage.Format.Format_RGB32)
+        painter = QPainter(image)
+        gradient = QLinearGradient(QPointF(0, 0), QPointF(*IMAGE_SIZE))
+        gradient.setColorAt(0, QColor.fromHsv(i * 37 % 360, 200, 230))
+        gradient.setColorAt(1, QColor.fromHsv((i * 37 + 180) % 360, 120, 40))
+        painter.fillRect(image.rect(), gradient)
+        painter.drawText(40, 80, f"benchmark {i}")
+        painter.end()
+        paths.append(os.path.join(bench.directory, f"photo-{i}.png"))
+        image.save(paths[-1])
+
+    editor = bench.open_editor([bench.main.document.Section("Tekst")])
+    section = editor.sections[0]
+    images = iter(paths)
+
+    def import_image():
+        section.image_label.copy_and_display_image(next(images))
+        bench.wait(lambda: section.image_job is None and section.image_label.thumbnail_job is None)
+        editor.flush_html()
+
+    samples = measure(import_image, repeat)
+    bench.close_editor(editor)
+    return [result("copy_and_display_image", samples, width=IMAGE_SIZE[0], height=IMAGE_SIZE[1])]
+
+
+def cold_start_child():
+    """ Runs in a fresh interpreter; prints the phases of one start as JSON. """
+    started = time.perf_counter()
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtCore import QCoreApplication, Qt
+    from PyQt6.QtWidgets import QApplication
+
+    import main
+
+    phases = {"import": time.perf_counter() - started}
+    QCoreApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
+    app = QApplication([sys.argv[0]])
+    phases["QApplication"] = time.perf_counter() - started
+    window = main.HtmlEditor()
+    window.show()
+    app.processEvents()
+    phases["first frame"] = time.perf_counter() - started
+    window.image_pipeline.shutdown()
+    window.paste_pipeline.shutdown()
+    window.asset_store.shutdown()
+    window.journal.close()
+    print(json.dumps(phases))
+
+
+def bench_cold_start(directory, repeat):
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    samples = []
+    phases = []
+    write_settings(directory)
+    for _ in range(repeat):
+        shutil.rmtree(os.path.join(directory, "autosave"), ignore_errors=True)
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--cold-start-child"],
+                                cwd=directory, env=env, capture_output=True, text=True, check=True).stdout
+        samples.append(time.perf_counter() - started)
+        phases.append(json.loads(output.splitlines()[-1]))
+
+    results = [result("cold_start.process", samples)]
+    for phase in phases[0]:
+        results.append(result(f"cold_start.{phase}", [run[phase] for run in phases]))
+    return results
+
+
+def environment():
+    from PyQt6.QtCore import PYQT_VERSION_STR, QT_VERSION_STR
+
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "qt": QT_VERSION_STR, "pyqt": PYQT_VERSION_STR, "cpus": os.cpu_count()}
+
+
+def result_key(entry):
+    return entry["name"], tuple(sorted(entry["params"].items()))
+
+
+def describe(entry):
+    params = ", ".join(f"{key}={value}" for key, value in sorted(entry["params"].items()))
+    return f"{entry['name']}[{params}]" if params else entry["name"]
+
+
+def write_results(results, path):
+    data = {"format": RESULTS_FORMAT, "version": RESULTS_VERSION, "created": time.time(),
+            "environment": environment(), "results": results}
+    text = json.dumps(data, indent=1)
+    if path in (None, "-"):
+        print(text)
+    else:
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+
+
+def compare(results, baseline_path, threshold, log=sys.stderr):
+    """ Print medians against a baseline file and return the names that regressed. """
+    with open(baseline_path, "r", encoding="utf-8") as file:
+        baseline = {result_key(entry): entry for entry in json.load(file)["results"]}
+
+    regressions = []
+    for entry in results:
+        old = baseline.get(result_key(entry))
+        if old is None:
+            continue
+        ratio = entry["median"] / old["median"] if old["median"] > 0 else 1.0
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressions.append(describe(entry))
+        print(f"{describe(entry):<55}{old['median'] * 1000:10.2f} ms {entry['median'] * 1000:10.2f} ms "
+              f"{ratio:6.2f}x{flag}", file=log)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark rendering and editor interactions headlessly.")
+    parser.add_argument("-o", "--output", default="-", help="JSON results file (default: stdout)")
+    parser.add_argument("-n", "--repeat", type=int, default=DEFAULT_REPEAT, help="runs per benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="section counts for the update_html benchmarks")
+    parser.add_argument("--skip", nargs="+", default=[],
+                        choices=["update_html", "interactions", "image", "cold_start"])
+    parser.add_argument("--compare", metavar="BASELINE", help="results file of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slowdown factor of a median that counts as a regression")
+    parser.add_argument("--cold-start-child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.cold_start_child:
+        cold_start_child()
+        return 0
+
+    output = os.path.abspath(args.output) if args.output != "-" else args.output
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    directory = tempfile.mkdtemp(prefix="longdescription-bench-")
+    try:
+        results = []
+        bench = Bench(directory)
+        if "update_html" not in args.skip:
+            results += bench_update_html(bench, args.sizes, args.repeat)
+        if "interactions" not in args.skip:
+            results += bench_interactions(bench, args.repeat)
+        if "image" not in args.skip:
+            results += bench_image_import(bench, args.repeat)
+        if "cold_start" not in args.skip:
+            results += bench_cold_start(directory, args.repeat)
+    finally:
+        os.chdir(os.path.dirname(directory))
+        shutil.rmtree(directory, ignore_errors=True)
+
+    write_results(results, output)
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slower than {args.threshold}x the baseline", file=sys.stderr)
+            return 1
+    else:
+        for entry in results:
+            print(f"{describe(entry):<55}{entry['median'] * 1000:10.2f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
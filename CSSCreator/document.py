@@ -0,0 +1,399 @@
+import itertools
+import json
+import os
+import re
+
+# The document model and renderer deliberately avoid importing PyQt6, so
+# descriptions can be rendered in worker processes and headless batch jobs.
+
+DOCUMENT_HEAD = """
+                        <div class="longdescription__template">
+                            <div class="longdescription__template__row --layout-photo-text">
+                        """
+
+DOCUMENT_TAIL = """
+            </div>
+        </div>
+        """
+
+IMAGE_URL_PREFIX = "/data/include/cms/img-longdescription/"
+# Photos with narrower variants are offered to the browser through srcset.
+# Sections are laid out in two columns from the @laptop breakpoint of
+# preset.css (min-width: 1024px) on; below it the photo takes the full width.
+TWO_COLUMN_MIN_WIDTH = 1024
+IMAGE_SIZES = f"(max-width: {TWO_COLUMN_MIN_WIDTH - 1}px) 100vw, 50vw"
+
+# Lines of section and list text are nested one level per leading arrow.
+ARROW = "⤷"
+ARROW_PREFIX_CHARS = ARROW + " \t"
+
+# Pasted text: every kind of line break, bullets at the start of a line and
+# bullets run together inside one line, as text copied from PDFs often has.
+PASTE_LINE_BREAK = re.compile(r"\r\n|[\r\n\v\f\x85\u2028\u2029]")
+PASTE_BULLET = re.compile(r"[•●○◦▪▫■□‣⁃∙·*–—-]\s+")
+PASTE_INLINE_BULLET = re.compile(r"\s+[•●○◦▪■]\s+")
+PASTE_SPACES = re.compile(r" {2,}")
+PASTE_CHARACTERS = str.maketrans({"\u00a0": " ", "\u00ad": None, "\u200b": None, "\ufeff": None})
+
+# Project files are documents as accepted by document_from_dict plus a format
+# marker, so a folder of saved projects can be rendered with `main.py render`.
+PROJECT_FORMAT = "longdescription"
+PROJECT_VERSION = 1
+
+_block_ids = itertools.count(1)
+
+
+class Block:
+    """ Base of all blocks; id is unique for the process lifetime and never serialized. """
+    __slots__ = ("id",)
+    kind = ""
+    fields = ()
+    # Fields that follow from another field and are restored with it, so
+    # changing them isn't an undo step of its own.
+    derived_fields = ()
+
+    def __init__(self):
+        self.id = next(_block_ids)
+
+
+class Section(Block):
+    """ Photo-text row: a paragraph with ⤷ nesting next to an optional image.
+
+    image_widths lists the widths of the image's variants (see variant_name)
+    ending with the width of image_name itself; empty if it has none.
+    """
+    __slots__ = ("text", "image_name", "image_first", "image_widths")
+    kind = "section"
+    fields = __slots__
+    derived_fields = ("image_widths",)
+
+    def __init__(self, text="", image_name="", image_first=True, image_widths=()):
+        super().__init__()
+        self.text = text
+        self.image_name = image_name
+        self.image_first = image_first
+        self.image_widths = list(image_widths)
+
+
+class Header(Block):
+    __slots__ = ("level", "text")
+    kind = "header"
+    fields = __slots__
+
+    def __init__(self, level="h1", text=""):
+        super().__init__()
+        self.level = level
+        self.text = text
+
+
+class List(Block):
+    """ Paragraphs and ⤷ nested items rendered as an ul/ol list column. """
+    __slots__ = ("list_type", "text")
+    kind = "list"
+    fields = __slots__
+
+    def __init__(self, list_type="ul", text=""):
+        super().__init__()
+        self.list_type = list_type
+        self.text = text
+
+
+class YoutubeVideo(Block):
+    __slots__ = ("video_id", "thumbnail_url", "alt_text")
+    kind = "youtube"
+    fields = __slots__
+
+    def __init__(self, video_id="", thumbnail_url="", alt_text="Film Youtube"):
+        super().__init__()
+        self.video_id = video_id
+        self.thumbnail_url = thumbnail_url
+        self.alt_text = alt_text
+
+
+BLOCK_TYPES = {block_type.kind: block_type for block_type in (Section, Header, List, YoutubeVideo)}
+
+
+def block_to_dict(block):
+    data = {"kind": block.kind}
+    for field in block.fields:
+        data[field] = getattr(block, field)
+    return data
+
+
+def block_from_dict(data):
+    block_type = BLOCK_TYPES[data["kind"]]
+    return block_type(**{field: data[field] for field in block_type.fields if field in data})
+
+
+def document_to_dict(blocks):
+    return {"blocks": [block_to_dict(block) for block in blocks]}
+
+
+def document_from_dict(data):
+    """ Build blocks from {"blocks": [...]}; a bare list of blocks is accepted too. """
+    if isinstance(data, dict):
+        data = data["blocks"]
+    return [block_from_dict(block) for block in data]
+
+
+def save_project(path, blocks):
+    """ Write blocks to a project file, replacing path atomically. """
+    data = {"format": PROJECT_FORMAT, "version": PROJECT_VERSION}
+    data.update(document_to_dict(blocks))
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temporary_path, path)
+
+
+def load_project(path):
+    with open(path, "r", encoding="utf-8") as file:
+        data = json.load(file)
+    if isinstance(data, dict) and data.get("version", PROJECT_VERSION) > PROJECT_VERSION:
+        raise ValueError(f"{path} was saved by a newer version (format {data['version']})")
+    return document_from_dict(data)
+
+
+def normalize_pasted_text(text):
+    """ Text pasted into a section or list cleaned up, with its bullets turned into ⤷ nesting.
+
+    Whitespace inside lines is collapsed and runs of blank lines shrink to one.
+    Bulleted lines nest one level deeper per indentation step, like Python
+    blocks; lines already starting with arrows are kept as they are.
+    """
+    lines = []
+    indents = []  # indentation of each open bullet level
+    for line in PASTE_LINE_BREAK.split(text.translate(PASTE_CHARACTERS)):
+        line = line.expandtabs(4).rstrip()
+        content = line.lstrip()
+        if not content:
+            if lines and lines[-1]:
+                lines.append("")
+            continue
+        if content.startswith(ARROW):
+            lines.append(PASTE_SPACES.sub(" ", content))
+            continue
+
+        depth = 0
+        bullet = PASTE_BULLET.match(content)
+        if bullet:
+            indent = len(line) - len(content)
+            while indents and indents[-1] > indent:
+                indents.pop()
+            if not indents or indents[-1] < indent:
+                indents.append(indent)
+            depth = len(indents)
+            content = content[bullet.end():]
+        else:
+            indents = []
+
+        for i, piece in enumerate(PASTE_INLINE_BULLET.split(content)):
+            piece = PASTE_SPACES.sub(" ", piece).strip()
+            if piece:
+                lines.append(ARROW * (max(depth, 1) if i else depth) + piece)
+    while lines and not lines[-1]:
+        lines.pop()
+    return "\n".join(lines)
+
+
+def render_nesting(text, writer, skip_blank=False):
+    """ Render ⤷-nested text through writer in a single pass and return the joined HTML.
+
+    A line's depth is the number of its leading arrows; whitespace around and
+    between them is ignored. Lines without arrows go to writer.paragraph_line
+    unchanged (blank ones are dropped with skip_blank), so each block type
+    decides what a paragraph line keeps.
+    """
+    # Bound once; this loop runs per line of every section on each render.
+    item, paragraph_line, end_paragraph = writer.item, writer.paragraph_line, writer.end_paragraph
+    depth = 0
+    for line in text.split("\n"):
+        stripped = line.lstrip()
+        if stripped.startswith(ARROW):
+            content = stripped.lstrip(ARROW_PREFIX_CHARS)
+            line_depth = stripped.count(ARROW, 0, len(stripped) - len(content))
+            if not depth:
+                end_paragraph()
+            if line_depth != depth:
+                if line_depth > depth:
+                    writer.open_lists(depth, line_depth)
+                else:
+                    writer.close_lists(depth, line_depth)
+                depth = line_depth
+            item(depth, content.strip())
+        elif stripped or not skip_blank:
+            if depth:
+                writer.close_lists(depth, 0)
+                depth = 0
+            paragraph_line(line)
+    end_paragraph()
+    if depth:
+        writer.close_lists(depth, 0)
+    return "".join(writer.parts)
+
+
+class SectionTextWriter:
+    """ Compact HTML for section text: arrow lines become <ul> items, other lines <br>-joined paragraphs. """
+    __slots__ = ("parts", "paragraph")
+
+    def __init__(self):
+        self.parts = []
+        self.paragraph = []
+
+    def open_lists(self, depth, new_depth):
+        self.parts.append("<ul>" * (new_depth - depth))
+
+    def close_lists(self, depth, new_depth):
+        self.parts.append("</ul>" * (depth - new_depth))
+
+    def item(self, depth, content):
+        self.parts.append(f"<li>{content}</li>")
+
+    def paragraph_line(self, line):
+        self.paragraph.append(line.rstrip())
+
+    def end_paragraph(self):
+        if self.paragraph:
+            self.parts.append(f"<p>{'<br>'.join(self.paragraph)}</p>")
+            self.paragraph = []
+
+
+class ListTextWriter:
+    """ Indented HTML for list blocks: one <p> per plain line and nested list_tag lists. """
+    __slots__ = ("parts", "list_tag")
+
+    def __init__(self, list_tag):
+        self.parts = []
+        self.list_tag = list_tag
+
+    def open_lists(self, depth, new_depth):
+        if depth == 0:
+            self.parts.append(f"<{self.list_tag} class=\"list_item__list\">\n")
+            depth = 1
+        self.parts.append(f"{' ' * (4 * depth)}<{self.list_tag}>\n" * (new_depth - depth))
+
+    def close_lists(self, depth, new_depth):
+        indent = 4 * (new_depth + 1 if new_depth else depth)
+        self.parts.append(f"{' ' * indent}</{self.list_tag}>\n" * (depth - new_depth))
+
+    def item(self, depth, content):
+        self.parts.append(f"{' ' * (4 * depth)}<li>{content}</li>\n")
+
+    def paragraph_line(self, line):
+        self.parts.append(f"<p>{line.strip()}</p>\n")
+
+    def end_paragraph(self):
+        pass
+
+
+def variant_name(image_name, width):
+    """ File name of the variant of an image scaled down to width pixels. """
+    stem, extension = os.path.splitext(image_name)
+    return f"{stem}-{width}w{extension}"
+
+
+def render_image_sources(block):
+    """ srcset and sizes attributes for a photo with variants, or nothing. """
+    if len(block.image_widths) < 2:
+        return ""
+    *variant_widths, width = block.image_widths
+    sources = [f"{IMAGE_URL_PREFIX}{variant_name(block.image_name, variant_width)} {variant_width}w"
+               for variant_width in variant_widths]
+    sources.append(f"{IMAGE_URL_PREFIX}{block.image_name} {width}w")
+    return f' srcset="{", ".join(sources)}" sizes="{IMAGE_SIZES}"'
+
+
+def render_section(block):
+    text_html = f"""<div class="longdescription__template__col --text">
+                {render_nesting(block.text, SectionTextWriter())}
+                </div>"""
+
+    if block.image_name:
+        image_html = f"""
+                        <div class="longdescription__template__col --photo">
+                            <img src="{IMAGE_URL_PREFIX}{block.image_name}"{render_image_sources(block)} alt="Obraz">
+                        </div>
+                    """
+    else:
+        image_html = ""
+
+    if block.image_first:
+        return f"""
+                        <div class="row">
+                            {image_html}
+                            {text_html}
+                        </div>
+                    """
+    else:
+        return f"""
+                        <div class="row">
+                            {text_html}
+                            {image_html}
+                        </div>
+                    """
+
+
+def render_header(block):
+    return f"""
+                    <{block.level}>{block.text}</{block.level}>
+                """
+
+
+def render_youtube(block):
+    if not block.video_id:
+        return ""
+
+    return f"""
+                    <div class="longdescription__template__row --video">
+                        <div class="youtube-player">
+                            <div data-id="{block.video_id}" data-type="youtube-video">
+                                <img src="{block.thumbnail_url}" alt="{block.alt_text}">
+                                <span class="youtube-player__button">
+                                    <svg xmlns="http://www.w3.org/2000/svg" height="40px" viewBox="0 -960 960 960" width="40px" fill="#e3e3e3"><path d="m380-300 280-180-280-180v360ZM480-80q-83 0-156-31.5T197-197q-54-54-85.5-127T80-480q0-83 31.5-156T197-763q54-54 127-85.5T480-880q83 0 156 31.5T763-763q54 54 85.5 127T880-480q0 83-31.5 156T763-197q-54 54-127 85.5T480-80Zm0-80q134 0 227-93t93-227q0-134-93-227t-227-93q-134 0-227 93t-93 227q0 134 93 227t227 93Zm0-320Z"/></svg>
+                                </span>
+                            </div>
+                        </div>
+                    </div>
+                    """
+
+
+def render_list(block):
+    # Blank lines are skipped, so they neither end a list nor add a paragraph.
+    return (f"<div class=\"list_item__col --text\">\n"
+            f"{render_nesting(block.text, ListTextWriter(block.list_type), skip_blank=True)}"
+            f"</div>\n")
+
+
+def render_block(block):
+    if block.kind == "section":
+        return render_section(block)
+    elif block.kind == "header":
+        return render_header(block)
+    elif block.kind == "youtube":
+        return render_youtube(block)
+    elif block.kind == "list":
+        return render_list(block)
+    return ""
+
+
+def assemble_document(fragments):
+    """ Wrap already rendered block fragments into the longdescription template. """
+    return DOCUMENT_HEAD + "".join(fragments) + DOCUMENT_TAIL
+
+
+def iter_document(blocks):
+    """ Yield the document's HTML in chunks, one per block, so it never has to be held whole. """
+    yield DOCUMENT_HEAD
+    for block in blocks:
+        yield render_block(block)
+    yield DOCUMENT_TAIL
+
+
+def write_document(blocks, file):
+    """ Stream the rendered document into file, anything with a text write() method. """
+    for chunk in iter_document(blocks):
+        file.write(chunk)
+
+
+def render_document(blocks):
+    return "".join(iter_document(blocks))
@@ -0,0 +1,100 @@
+import re
+
+from PyQt6.QtGui import QColor, QSyntaxHighlighter, QTextCharFormat
+
+# Highlighting of the generated HTML pane. QSyntaxHighlighter re-runs
+# highlightBlock only for the lines an edit touched, and for the lines after
+# them while their carried-over state changes, so patching one section of a
+# long output only re-highlights that section.
+
+TEXT = 0
+TAG = 1  # inside <name ... up to the closing >
+STRING = 2  # inside a quoted attribute value that continues on the next line
+COMMENT = 3
+
+MARKUP = re.compile(r"<!--|</?[A-Za-z][\w:.-]*|&#?\w+;")
+TAG_PART = re.compile(r"\"[^\"]*\"?|[^\s=\"'/>]+(?=\s*=)|/?>")
+
+
+class HtmlHighlighter(QSyntaxHighlighter):
+    def __init__(self, document, colors):
+        super().__init__(document)
+        self.formats = {}
+        self.colors = None
+        self.set_colors(colors, rehighlight=False)
+
+    def set_colors(self, colors, rehighlight=True):
+        """ Switch to another theme's colors; re-highlights everything, so only done when they differ. """
+        if colors == self.colors:
+            return
+        self.colors = colors
+        for name, color in colors.items():
+            text_format = QTextCharFormat()
+            text_format.setForeground(QColor(color))
+            self.formats[name] = text_format
+        if rehighlight:
+            self.rehighlight()
+
+    def highlightBlock(self, text):
+        state = max(self.previousBlockState(), TEXT)
+        position = 0
+        length = len(text)
+        # setFormat counts UTF-16 code units, which differ from str indexes
+        # only when the line has characters outside the BMP, e.g. emoji.
+        wide = not text.isascii() and len(text.encode("utf-16-le")) != 2 * length
+
+        def mark(start, end, name):
+            if wide:
+                start, end = (len(text[:i].encode("utf-16-le")) // 2 for i in (start, end))
+            self.setFormat(start, end - start, self.formats[name])
+
+        while position < length:
+            if state == COMMENT:
+                end = text.find("-->", position)
+                if end < 0:
+                    mark(position, length, "comment")
+                    break
+                mark(position, end + 3, "comment")
+                position = end + 3
+                state = TEXT
+            elif state == STRING:
+                end = text.find('"', position)
+                if end < 0:
+                    mark(position, length, "string")
+                    break
+                mark(position, end + 1, "string")
+                position = end + 1
+                state = TAG
+            elif state == TAG:
+                for match in TAG_PART.finditer(text, position):
+                    token = match.group()
+                    position = match.end()
+                    if token.startswith('"'):
+                        mark(match.start(), position, "string")
+                        if len(token) == 1 or not token.endswith('"'):
+                            state = STRING
+                            break
+                    elif token.endswith(">"):
+                        mark(match.start(), position, "tag")
+                        state = TEXT
+                        break
+                    else:
+                        mark(match.start(), position, "attribute")
+                else:
+                    break  # the tag goes on in the next line
+            else:
+                match = MARKUP.search(text, position)
+                if match is None:
+                    break
+                token = match.group()
+                if token == "<!--":
+                    position = match.start()
+                    state = COMMENT
+                elif token.startswith("&"):
+                    mark(match.start(), match.end(), "entity")
+                    position = match.end()
+                else:
+                    mark(match.start(), match.end(), "tag")
+                    position = match.end()
+                    state = TAG
+        self.setCurrentBlockState(state)
@@ -0,0 +1,203 @@
+import time
+from collections import deque
+
+# Undo history over the document model. Commands hold deltas rather than
+# copies of the document: a text edit keeps only the replaced range, so
+# thousands of steps fit in a few MB. Applying them is up to the editor.
+
+
+def common_prefix_length(a, b):
+    """ Length of the longest common prefix, found by bisecting on C-level slice compares. """
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def common_suffix_length(a, b):
+    """ Length of the longest common suffix, see common_prefix_length. """
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:] == b[len(b) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def text_delta(old, new):
+    """ (start, removed, inserted) such that old[:start] + inserted + the rest of old is new. """
+    start = common_prefix_length(old, new)
+    end = common_suffix_length(old[start:], new[start:])
+    return start, old[start:len(old) - end], new[start:len(new) - end]
+
+
+class TextEdit:
+    """ Replacement of one range in a string field of a block. """
+    __slots__ = ("block_id", "field", "start", "removed", "inserted", "time")
+
+    def __init__(self, block_id, field, start, removed, inserted):
+        self.block_id = block_id
+        self.field = field
+        self.start = start
+        self.removed = removed
+        self.inserted = inserted
+        self.time = time.monotonic()
+
+    def size(self):
+        return 100 + len(self.removed) + len(self.inserted)
+
+    def apply(self, value, undo):
+        if undo:
+            return value[:self.start] + self.removed + value[self.start + len(self.inserted):]
+        return value[:self.start] + self.inserted + value[self.start + len(self.removed):]
+
+    def merge(self, later):
+        """ Fold a later edit of the same field into this one if the two ranges touch. """
+        if not isinstance(later, TextEdit) or later.block_id != self.block_id or later.field != self.field:
+            return False
+        start, end = self.start, self.start + len(self.inserted)
+        later_end = later.start + len(later.removed)
+        if later.start > end or later_end < start:
+            return False
+
+        # Positions below are in the text between the two edits.
+        union_start = min(start, later.start)
+        removed = later.removed[:max(start - later.start, 0)] + self.removed
+        if later_end > end:
+            removed += later.removed[end - later.start:]
+        inserted = self.inserted[:max(later.start - start, 0)] + later.inserted
+        if end > later_end:
+            inserted += self.inserted[later_end - start:]
+        self.start = union_start
+        self.removed = removed
+        self.inserted = inserted
+        self.time = later.time
+        return True
+
+
+class FieldEdit:
+    """ Change of a non-text field, e.g. the image side of a section. """
+    __slots__ = ("block_id", "field", "old", "new", "time")
+
+    def __init__(self, block_id, field, old, new):
+        self.block_id = block_id
+        self.field = field
+        self.old = old
+        self.new = new
+        self.time = time.monotonic()
+
+    def size(self):
+        return 100
+
+    def apply(self, value, undo):
+        return self.old if undo else self.new
+
+    def merge(self, later):
+        return False
+
+
+class InsertBlock:
+    __slots__ = ("index", "block", "time", "block_size")
+
+    def __init__(self, index, block):
+        self.index = index
+        self.block = block
+        self.time = time.monotonic()
+        # Measured once: the block goes on being edited after it was inserted,
+        # and History.size must drop by what it was increased by.
+        self.block_size = 100 + sum(len(getattr(block, field)) for field in block.fields
+                                    if isinstance(getattr(block, field), str))
+
+    def size(self):
+        return self.block_size
+
+    def merge(self, later):
+        return False
+
+
+class DeleteBlock(InsertBlock):
+    __slots__ = ()
+
+
+class MoveBlock:
+    __slots__ = ("block_id", "direction", "time")
+
+    def __init__(self, block_id, direction):
+        self.block_id = block_id
+        self.direction = direction
+        self.time = time.monotonic()
+
+    def size(self):
+        return 100
+
+    def merge(self, later):
+        return False
+
+
+def field_edit(block_id, field, old, new):
+    if isinstance(old, str):
+        start, removed, inserted = text_delta(old, new)
+        return TextEdit(block_id, field, start, removed, inserted)
+    return FieldEdit(block_id, field, old, new)
+
+
+class History:
+    """ Undo and redo stacks of commands.
+
+    Consecutive edits of the same field less than coalesce_seconds apart are
+    merged into one step, and the oldest steps are dropped once the commands
+    together exceed max_bytes.
+    """
+
+    def __init__(self, max_bytes=4 * 1024 * 1024, coalesce_seconds=1.0):
+        self.max_bytes = max_bytes
+        self.coalesce_seconds = coalesce_seconds
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.size = 0
+
+    def push(self, command):
+        # Right after an undo the top of the stack is an older step; never merge into it.
+        after_undo = bool(self.redo_stack)
+        for redone in self.redo_stack:
+            self.size -= redone.size()
+        self.redo_stack.clear()
+
+        if self.undo_stack and not after_undo:
+            last = self.undo_stack[-1]
+            if command.time - last.time <= self.coalesce_seconds:
+                before = last.size()
+                if last.merge(command):
+                    self.size += last.size() - before
+                    return
+
+        self.undo_stack.append(command)
+        self.size += command.size()
+        while self.size > self.max_bytes and len(self.undo_stack) > 1:
+            self.size -= self.undo_stack.popleft().size()
+
+    def undo(self):
+        """ The command to revert, moved to the redo stack, or None. """
+        if not self.undo_stack:
+            return None
+        command = self.undo_stack.pop()
+        self.redo_stack.append(command)
+        return command
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        command = self.redo_stack.pop()
+        self.undo_stack.append(command)
+        return command
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.size = 0
@@ -0,0 +1,276 @@
+import hashlib
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PyQt6.QtCore import Qt, QObject, QSize, pyqtSignal
+from PyQt6.QtGui import QImageReader, QImageWriter
+
+import document
+
+# Image work runs on QImage, which unlike QPixmap is safe to use outside the
+# GUI thread, so decoding and encoding never block the editor.
+
+HAS_WEBP_WRITER = b"webp" in [bytes(image_format) for image_format in QImageWriter.supportedImageFormats()]
+
+THUMBNAIL_SIZE = 300
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp")
+
+
+class EncodedImage:
+    def __init__(self, paths, source_size, encoded_size, width, height, seconds, reused=False):
+        self.paths = paths
+        self.source_size = source_size
+        self.encoded_size = encoded_size
+        self.width = width
+        self.height = height
+        self.seconds = seconds
+        self.reused = reused
+        # Widths of the variants and of the image itself, as in document.Section.image_widths.
+        self.widths = []
+
+    def summary(self):
+        if self.reused:
+            return f"{os.path.basename(self.paths[0])}: {self.width}x{self.height}, już zaimportowany"
+        return (f"{os.path.basename(self.paths[0])}: {self.width}x{self.height}, "
+                f"{self.source_size / 1024:.0f} KB → {self.encoded_size / 1024:.0f} KB "
+                f"w {self.seconds * 1000:.0f} ms")
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_thumbnail(path, size=THUMBNAIL_SIZE, cached_digests=()):
+    """ Return (content digest, QImage decoded directly at thumbnail size).
+
+    The image is None when the digest is already in cached_digests, so repeated
+    imports of the same file skip decoding entirely.
+    """
+    digest = file_digest(path)
+    if digest in cached_digests:
+        return digest, None
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    source_size = reader.size()
+    if source_size.isValid():
+        reader.setScaledSize(source_size.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        raise ValueError(f"Cannot decode {path}: {reader.errorString()}")
+    return digest, image
+
+
+def read_image(source_path, max_width=0):
+    """ Decode an image, letting the reader scale down during decoding when it is wider than max_width. """
+    reader = QImageReader(source_path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if max_width and size.isValid() and size.width() > max_width:
+        reader.setScaledSize(QSize(max_width, round(size.height() * max_width / size.width())))
+    image = reader.read()
+    if image.isNull():
+        raise ValueError(f"Cannot decode {source_path}: {reader.errorString()}")
+    return image
+
+
+def encode_webp(source_path, destination_path, max_width=0, quality=85):
+    """ Transcode source_path to WebP at destination_path, replacing it atomically. """
+    started = time.perf_counter()
+    image = read_image(source_path, max_width)
+    temporary_path = f"{destination_path}.{threading.get_ident()}.tmp"
+    writer = QImageWriter(temporary_path, b"webp")
+    writer.setQuality(quality)
+    if not writer.write(image):
+        raise OSError(f"Cannot write {destination_path}: {writer.errorString()}")
+    os.replace(temporary_path, destination_path)
+    return EncodedImage([destination_path], os.path.getsize(source_path), os.path.getsize(destination_path),
+                        image.width(), image.height(), time.perf_counter() - started)
+
+
+def link_or_copy(source_path, destination_path):
+    try:
+        os.link(source_path, destination_path)
+    except OSError:
+        shutil.copy2(source_path, destination_path)
+
+
+class AssetStore:
+    """ Content-addressed image store.
+
+    Files are named after a hash of the source bytes and the encoding settings,
+    so importing the same photo again is a no-op and its <img src> never changes.
+    The mirror directory (the Desktop folder) gets a hard link rather than a
+    second copy wherever the file system allows it.
+
+    Each image also gets a variant for every one of variant_widths narrower
+    than itself. They are named after the image, so they are cached the same
+    way, and are encoded in parallel on a process pool since encoding holds
+    the GIL for part of the work.
+    """
+
+    def __init__(self, directory, mirror_directory=None, max_width=0, quality=85, variant_widths=()):
+        self.directory = directory
+        self.mirror_directory = mirror_directory
+        self.max_width = max_width
+        self.quality = quality
+        self.variant_widths = sorted(variant_widths)
+        self.variant_pool = None
+        self.variant_pool_lock = threading.Lock()
+
+    def asset_name(self, source_path, digest):
+        if not HAS_WEBP_WRITER:
+            # Without a WebP plugin the original bytes are stored under their own extension.
+            return digest[:16] + os.path.splitext(source_path)[1].lower()
+        key = hashlib.sha256(f"{digest}:{self.max_width}:{self.quality}".encode()).hexdigest()
+        return key[:16] + ".webp"
+
+    def add(self, source_path):
+        started = time.perf_counter()
+        name = self.asset_name(source_path, file_digest(source_path))
+        path = os.path.join(self.directory, name)
+        os.makedirs(self.directory, exist_ok=True)
+
+        if os.path.isfile(path):
+            size = QImageReader(path).size()
+            encoded = EncodedImage([path], os.path.getsize(source_path), os.path.getsize(path),
+                                   size.width(), size.height(), time.perf_counter() - started, reused=True)
+        elif HAS_WEBP_WRITER:
+            encoded = encode_webp(source_path, path, self.max_width, self.quality)
+        else:
+            link_or_copy(source_path, path)
+            size = QImageReader(path).size()
+            encoded = EncodedImage([path], os.path.getsize(source_path), os.path.getsize(path),
+                                   size.width(), size.height(), time.perf_counter() - started)
+
+        encoded.widths = self.add_variants(source_path, name, encoded.width)
+        if self.mirror_directory:
+            encoded.paths.append(self.mirror(name))
+        return encoded
+
+    def mirror(self, name):
+        os.makedirs(self.mirror_directory, exist_ok=True)
+        mirror_path = os.path.join(self.mirror_directory, name)
+        if not os.path.isfile(mirror_path):
+            link_or_copy(os.path.join(self.directory, name), mirror_path)
+        return mirror_path
+
+    def add_variants(self, source_path, name, width):
+        """ Encode the missing variants of the stored image name and return its widths, see EncodedImage.widths. """
+        widths = [variant_width for variant_width in self.variant_widths if variant_width < width]
+        if not widths or not HAS_WEBP_WRITER:
+            return []
+        missing = [variant_width for variant_width in widths
+                   if not os.path.isfile(os.path.join(self.directory, document.variant_name(name, variant_width)))]
+        if missing:
+            pool = self.get_variant_pool()
+            try:
+                jobs = [pool.submit(encode_webp, source_path,
+                                    os.path.join(self.directory, document.variant_name(name, variant_width)),
+                                    variant_width, self.quality)
+                        for variant_width in missing]
+                for job in jobs:
+                    job.result()
+            except Exception as e:
+                # The image itself is fine; it is just offered without variants.
+                print(f"Error during add_variants: {e}")
+                if isinstance(e, BrokenProcessPool):
+                    with self.variant_pool_lock:
+                        if self.variant_pool is pool:
+                            self.variant_pool = None
+                return []
+        if self.mirror_directory:
+            for variant_width in widths:
+                self.mirror(document.variant_name(name, variant_width))
+        return widths + [width]
+
+    def widths(self, name):
+        """ EncodedImage.widths of an already stored image, from the variants on disk. """
+        path = os.path.join(self.directory, name)
+        if not os.path.isfile(path):
+            return []
+        widths = [variant_width for variant_width in self.variant_widths
+                  if os.path.isfile(os.path.join(self.directory, document.variant_name(name, variant_width)))]
+        return widths + [QImageReader(path).size().width()] if widths else []
+
+    def get_variant_pool(self):
+        # Several image jobs may need it at once; it is only created once.
+        with self.variant_pool_lock:
+            if self.variant_pool is None:
+                # Spawned rather than forked: forking a process with Qt's threads running is unsafe.
+                self.variant_pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+            return self.variant_pool
+
+    def shutdown(self):
+        with self.variant_pool_lock:
+            if self.variant_pool is not None:
+                self.variant_pool.shutdown(wait=False, cancel_futures=True)
+                self.variant_pool = None
+
+
+def import_image(asset_store, source_path, size=THUMBNAIL_SIZE, cached_digests=()):
+    """ Return (EncodedImage, read_thumbnail of the stored file) for an image that has no label to show it yet. """
+    encoded = asset_store.add(source_path)
+    return encoded, read_thumbnail(encoded.paths[-1], size, cached_digests)
+
+
+class PixmapCache:
+    """ Least recently used QPixmap cache keyed by file content digest.
+
+    Only the GUI thread may get or put; workers just test membership.
+    """
+
+    def __init__(self, capacity=128):
+        self.capacity = capacity
+        self.pixmaps = OrderedDict()
+
+    def __contains__(self, digest):
+        return digest in self.pixmaps
+
+    def get(self, digest):
+        pixmap = self.pixmaps.get(digest)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(digest)
+        return pixmap
+
+    def put(self, digest, pixmap):
+        self.pixmaps[digest] = pixmap
+        self.pixmaps.move_to_end(digest)
+        while len(self.pixmaps) > self.capacity:
+            self.pixmaps.popitem(last=False)
+
+
+class ImagePipeline(QObject):
+    """ Runs image jobs on a thread pool and hands each finished future back on the GUI thread. """
+    job_finished = pyqtSignal(object, object)
+
+    def __init__(self, parent=None, max_workers=None):
+        super().__init__(parent)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="images")
+        # Always queued, so a job that finished before submit() returned is still
+        # delivered after the caller has stored its future.
+        self.job_finished.connect(self.deliver, Qt.ConnectionType.QueuedConnection)
+
+    def submit(self, callback, function, *args):
+        future = self.executor.submit(function, *args)
+        future.add_done_callback(lambda done: self.job_finished.emit(callback, done))
+        return future
+
+    def deliver(self, callback, future):
+        try:
+            callback(future)
+        except RuntimeError as e:
+            # The receiving widget was deleted while the job was running.
+            print(f"Error delivering image job: {e}")
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
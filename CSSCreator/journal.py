@@ -0,0 +1,209 @@
+import json
+import os
+import queue
+import threading
+
+import document
+
+# Crash recovery for the document being edited. The GUI thread only puts
+# already copied block data on a queue; serializing, writing and fsyncing
+# happen on the journal's own thread.
+
+SNAPSHOT_NAME = "snapshot.json"
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+
+
+def segments(directory):
+    """ (number, path) of the segment files in directory, oldest first. """
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    found = []
+    for name in names:
+        number = name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX) and number.isdigit():
+            found.append((int(number), os.path.join(directory, name)))
+    return sorted(found)
+
+
+def fsync_directory(directory):
+    # Makes a rename durable; directories can't be opened like this on Windows.
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def recover(directory):
+    """ Rebuild the document last recorded in directory, or None when there is no journal. """
+    snapshot_path = os.path.join(directory, SNAPSHOT_NAME)
+    found = segments(directory)
+    if not os.path.isfile(snapshot_path) and not found:
+        return None
+
+    blocks = {}
+    order = []
+    covered = 0
+    if os.path.isfile(snapshot_path):
+        with open(snapshot_path, "r", encoding="utf-8") as file:
+            snapshot = json.load(file)
+        covered = snapshot["segment"]
+        for entry in snapshot["blocks"]:
+            blocks[entry["id"]] = entry["block"]
+            order.append(entry["id"])
+
+    for number, path in found:
+        if number <= covered:
+            continue  # already in the snapshot; compaction was interrupted before removing it
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # torn write at the end of the last segment
+                if entry["t"] == "block":
+                    blocks[entry["id"]] = entry["block"]
+                elif entry["t"] == "order":
+                    order = entry["ids"]
+
+    return [document.block_from_dict(blocks[block_id]) for block_id in order if block_id in blocks]
+
+
+class AutosaveJournal:
+    """ Append-only journal of section edits.
+
+    The directory holds a snapshot of the whole document plus the segments
+    appended since it was written. Every batch of edits is fsynced before the
+    next one is taken, and once max_segments are full they are compacted into a
+    new snapshot, so the journal never uses much more than
+    max_segments * segment_bytes next to the snapshot.
+    """
+
+    def __init__(self, directory, segment_bytes=256 * 1024, max_segments=4):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.queue = queue.Queue()
+        self.thread = None
+        self.recorded_order = None
+        # Owned by the journal thread.
+        self.blocks = {}
+        self.order = []
+        self.segment = None
+        self.segment_number = 0
+        self.live_segments = 0
+
+    def start(self, blocks):
+        """ Begin a new journal whose snapshot is blocks, replacing whatever was recorded before. """
+        self.recorded_order = [block.id for block in blocks]
+        snapshot = [(block.id, document.block_to_dict(block)) for block in blocks]
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="autosave", daemon=True)
+            self.thread.start()
+        self.queue.put(("snapshot", snapshot))
+
+    def record(self, changed_blocks, order):
+        """ Queue the new contents of changed_blocks and, if it differs from the last one, the block order. """
+        if self.thread is None:
+            return
+        if order == self.recorded_order:
+            order = None
+        else:
+            self.recorded_order = order
+        if changed_blocks or order is not None:
+            changes = [(block.id, document.block_to_dict(block)) for block in changed_blocks]
+            self.queue.put(("edit", (changes, order)))
+
+    def close(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def run(self):
+        while True:
+            items = [self.queue.get()]
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self.write_batch(items)
+            except OSError as e:
+                print(f"Error writing autosave journal: {e}")
+            if items[-1] is None:
+                self.close_segment()
+                return
+
+    def write_batch(self, items):
+        lines = []
+        for item in items:
+            if item is None:
+                break
+            kind, payload = item
+            if kind == "snapshot":
+                lines = []  # everything before it is replaced
+                self.blocks = dict(payload)
+                self.order = [block_id for block_id, _ in payload]
+                self.write_snapshot()
+                continue
+
+            changes, order = payload
+            for block_id, data in changes:
+                self.blocks[block_id] = data
+                lines.append(json.dumps({"t": "block", "id": block_id, "block": data}, ensure_ascii=False))
+            if order is not None:
+                self.order = order
+                kept = set(order)
+                self.blocks = {block_id: data for block_id, data in self.blocks.items() if block_id in kept}
+                lines.append(json.dumps({"t": "order", "ids": order}))
+
+        if lines:
+            if self.segment is None or self.segment.tell() >= self.segment_bytes:
+                self.rotate_segment()
+            self.segment.write(("\n".join(lines) + "\n").encode("utf-8"))
+            self.segment.flush()
+            os.fsync(self.segment.fileno())
+
+    def rotate_segment(self):
+        self.close_segment()
+        if self.live_segments >= self.max_segments:
+            self.write_snapshot()
+        self.segment_number += 1
+        self.live_segments += 1
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{self.segment_number}{SEGMENT_SUFFIX}")
+        self.segment = open(path, "wb")
+        fsync_directory(self.directory)
+
+    def close_segment(self):
+        if self.segment is not None:
+            self.segment.close()
+            self.segment = None
+
+    def write_snapshot(self):
+        """ Fold the current state into a new snapshot and drop the segments it covers. """
+        self.close_segment()
+        os.makedirs(self.directory, exist_ok=True)
+        found = segments(self.directory)
+        # Segment numbers only grow, so the snapshot can name the last one it
+        # covers and older segments left behind by a crash are ignored.
+        self.segment_number = max([self.segment_number] + [number for number, _ in found])
+        path = os.path.join(self.directory, SNAPSHOT_NAME)
+        data = {"segment": self.segment_number,
+                "blocks": [{"id": block_id, "block": self.blocks[block_id]}
+                           for block_id in self.order if block_id in self.blocks]}
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False, separators=(",", ":"))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(f"{path}.tmp", path)
+        fsync_directory(self.directory)
+        for _, segment_path in found:
+            os.remove(segment_path)
+        self.live_segments = 0
@@ -1,20 +1,306 @@
+import time
+
+STARTUP_STARTED = time.perf_counter()
+
+import bisect
+import itertools
 import json
 import os
-import random
-import shutil
-from PyQt6.QtCore import Qt, QStandardPaths, QSize, QTimer, QPropertyAnimation, QRect, QEvent, QUrl
+import sys
+
+if __name__ == "__main__":
+    import multiprocessing
+
+    # Both before the Qt imports: in the frozen build every worker process
+    # starts this file again and leaves it in freeze_support, and batch
+    # rendering doesn't need Qt at all.
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1 and sys.argv[1] == "render":
+        import runpy
+
+        # Run as __main__, batch is also what the worker processes import
+        # under spawn instead of this file.
+        del sys.argv[1]
+        runpy.run_module("batch", run_name="__main__", alter_sys=True)
+        sys.exit()
+
+from PyQt6.QtCore import Qt, QStandardPaths, QSize, QTimer, QPropertyAnimation, QRect, QEvent, QUrl, QElapsedTimer, \
+    QCoreApplication, QMimeData, pyqtSignal
 from PyQt6.QtGui import QPixmap, QPainter, QColor, QFont, QClipboard, QIcon, QTextCursor, QShortcut, QKeySequence, \
     QTextCharFormat
 from PyQt6.QtWidgets import (
     QApplication, QLabel, QMainWindow, QVBoxLayout, QPushButton, QScrollArea,
     QWidget, QHBoxLayout, QTextEdit, QSplitter, QStackedWidget, QComboBox, QMessageBox, QFileDialog, QLineEdit, QLayout,
-    QDialog
+    QDialog, QCheckBox, QTableWidget, QTableWidgetItem, QHeaderView, QPlainTextEdit, QProgressDialog
 )
-try:
-    from PyQt6.QtWebEngineWidgets import QWebEngineView
-    HAS_WEBENGINE = True
-except ImportError:
-    HAS_WEBENGINE = False
+
+import document
+import highlighter
+import history
+import images
+import journal
+import profiling
+import richtext
+import themes
+
+PREVIEW_STYLE = """<style>
+.longdescription__template__col.--text,
+    .list_item__col.--text,
+    .longdescription__headline,
+    .longdescription__template__headline {
+      word-break: break-word; 
+      overflow-wrap: break-word; 
+      hyphens: auto; 
+    }
+body {
+  max-width: 1920px;
+  margin: 0 auto; 
+  width: 90%;
+
+}
+.longdescription {
+  display: flex;
+  flex-direction: column;
+  align-items: center;
+
+  padding-top: 4.8rem;
+  scroll-margin-top: 11.2rem;
+}
+.longdescription__template,
+    .longdescription__template__row.--layout-photo-text {
+      max-width: 100%; 
+    }
+@media (min-width: 1024px) {
+  .longdescription {
+    padding-top: 10.2rem;
+    scroll-margin-top: initial;
+  }
+}
+.longdescription__template__col img,
+    .longdescription__template__col video {
+      max-width: 90%;
+      height: auto;
+      display: block;
+    }
+
+.longdescription.cm {
+  margin-bottom: 0;
+  overflow: initial;
+}
+
+.longdescription > * {
+  width: 100%;
+}
+
+.longdescription > .longdescription__row {
+  order: -2;
+}
+
+.longdescription__headline {
+  font-size: 2.4rem;
+  line-height: 2.4rem;
+  margin-bottom: 3.2rem;
+  text-transform: uppercase;
+  font-weight: 700;
+}
+
+.longdescription__return_info {
+  display: flex;
+  margin-top: 3.2rem;
+}
+
+.longdescription__return_msg {
+  border: 1px solid #ccc;
+  border-radius: 8px;
+  padding: 1.5rem;
+}
+
+.longdescription__template {
+  display: grid;
+  gap: 1.6rem;
+}
+
+@media (min-width: 1024px) {
+  .longdescription__template {
+    gap: 10.2rem;
+    max-width: 1920px;
+  }
+}
+
+.longdescription__template__row.--layout-photo-text {
+  display: grid;
+  gap: 1.6rem;
+}
+
+@media (min-width: 1024px) {
+  .longdescription__template__row.--layout-photo-text {
+    row-gap: 10.2rem;
+  }
+
+  .longdescription__template__row.--layout-photo-text .row {
+    display: flex;
+    align-items: center;
+    gap: 1.6rem;
+    margin: 0;
+    flex-wrap: wrap;
+  }
+
+
+
+  .longdescription__template__row.--layout-photo-text .row > * {
+    flex: 0 0 calc(50% - 0.8rem);
+    max-width: calc(50% - 0.8rem);
+     box-sizing: border-box;
+  }
+}
+
+.longdescription__template__col {
+  display: flex;
+  justify-content: center;
+  align-items: center;
+}
+
+.longdescription__template__col img[alt] {
+  background-color: #ccc;
+  padding: 5.6rem;
+  padding-left: 15.6rem;
+  padding-right: 15.6rem;
+  border: 3px dotted #444;
+  color: #white;
+}
+
+.longdescription__template__col.--text {
+  flex-direction: column;
+  align-items: flex-start;
+  justify-content: center;
+  padding: 4.8rem;
+  gap: 1.6rem;
+  font-size: 1.6rem;
+  line-height: 1.8;
+  text-wrap: wrap;
+}
+
+.longdescription__template__col.--text .col__headline {
+  font-size: 1.8rem;
+  font-weight: 600;
+  line-height: 1.3;
+  text-transform: uppercase;
+}
+
+.longdescription__template__col.--text p {
+  margin: 0;
+  line-height: 1.8;
+}
+
+.longdescription__template__headline {
+  font-size: 2.4rem;
+  font-weight: 600;
+  text-align: center;
+  text-transform: uppercase;
+}
+
+.longdescription__template__list {
+  list-style: none;
+  padding-left: 0 !important;
+}
+
+.longdescription__template__list_item {
+  border-top: 1px solid #ccc;
+  margin-top: 3.2rem;
+  padding-top: 3.2rem;
+}
+
+.list_item__row {
+  display: grid;
+  gap: 1.6rem;
+  grid-template-columns: minmax(0, 1fr);
+}
+
+@media (min-width: 1024px) {
+  .list_item__row {
+    gap: 7.2rem;
+    grid-template-columns: auto minmax(0, 1fr);
+  }
+}
+
+.list_item__col.--text {
+  display: grid;
+  gap: 1.6rem;
+}
+
+.list_item__headline {
+  font-size: 1.8rem;
+  font-weight: 600;
+  line-height: 1.8rem;
+  text-transform: uppercase;
+}
+
+.list_item__list {
+  list-style: none;
+  padding: 0;
+}
+
+.list_item__list li {
+  display: flex;
+  align-items: flex-start;
+  justify-content: flex-start;
+}
+
+.list_item__list li::before {
+  content: '•';
+  flex: 0 0 3.2rem;
+  text-align: center;
+}
+
+</style>
+"""
+
+# Each section lives in its own display: contents wrapper keyed by the block
+# id, so previewPatch can replace or reorder sections without a page reload.
+PREVIEW_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+""" + PREVIEW_STYLE + """
+<script>
+function previewPatch(order, changed) {
+    var root = document.getElementById("preview-sections");
+    var wrappers = {};
+    for (var i = 0; i < root.children.length; i++) {
+        wrappers[root.children[i].dataset.section] = root.children[i];
+    }
+    for (var id in changed) {
+        if (!wrappers[id]) {
+            wrappers[id] = document.createElement("div");
+            wrappers[id].dataset.section = id;
+            wrappers[id].style.display = "contents";
+        }
+        wrappers[id].innerHTML = changed[id];
+    }
+    if (order !== null) {
+        var kept = {};
+        order.forEach(function (id) {
+            root.appendChild(wrappers[id]);
+            kept[id] = true;
+        });
+        for (var id in wrappers) {
+            if (!kept[id]) {
+                wrappers[id].remove();
+            }
+        }
+    }
+}
+</script>
+</head>
+<body>
+<div class="longdescription__template">
+    <div class="longdescription__template__row --layout-photo-text" id="preview-sections"></div>
+</div>
+</body>
+</html>
+"""
+
+
 def resource_path(relative_path):
     """ Get the absolute path to a resource, works for dev and for PyInstaller. """
     if getattr(sys, "frozen", False):  # If the app is frozen when packaged with PyInstaller
@@ -23,8 +309,190 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")  # Base path for development
     return os.path.join(base_path, relative_path)
 
+
+class StartupTrace:
+    """ Time spent per startup phase, measured from the first line of this module. """
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.phases = []
+        self.last = STARTUP_STARTED
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self, file=sys.stderr):
+        if not self.enabled:
+            return
+        for phase, seconds in self.phases:
+            print(f"{phase:<28}{seconds * 1000:8.1f} ms", file=file)
+        print(f"{'total':<28}{(self.last - STARTUP_STARTED) * 1000:8.1f} ms", file=file)
+
+
+def utf16_length(text):
+    """ Length of text in UTF-16 code units, which is how QTextCursor counts positions. """
+    if text.isascii():
+        return len(text)
+    return len(text.encode("utf-16-le")) // 2
+
+class EditorSection:
+    """ One block in the editor: its document node, rendered fragment (None while stale)
+    and, only while it is scrolled into view, its widgets (None otherwise). """
+    __slots__ = ("node", "fragment", "height", "row", "layout", "buttons_widget")
+    widget_slots = ("row", "layout", "buttons_widget")
+
+    def __init__(self, node):
+        self.node = node
+        self.fragment = None
+        self.height = None
+        self.row = None
+        self.layout = None
+        self.buttons_widget = None
+
+    @property
+    def id(self):
+        return self.node.id
+
+    @property
+    def kind(self):
+        return self.node.kind
+
+    def sync_node(self):
+        """ Copy the values edited in the widgets into the document node. """
+
+    def load_node(self):
+        """ Show the node's values in the widgets after the node was changed directly, e.g. by undo. """
+
+    def release(self):
+        for name in self.widget_slots:
+            setattr(self, name, None)
+
+
+class PhotoTextSection(EditorSection):
+    __slots__ = ("image_label", "text_edit", "image_path", "image_summary", "image_widths", "image_job")
+    widget_slots = EditorSection.widget_slots + ("image_label", "text_edit")
+
+    def __init__(self, node):
+        super().__init__(node)
+        self.image_label = None
+        self.text_edit = None
+        self.image_path = ""
+        self.image_summary = ""
+        self.image_widths = []
+        self.image_job = None
+
+    def sync_node(self):
+        if self.text_edit is not None:
+            self.node.text = self.text_edit.marked_text()
+        # A file that is missing, e.g. when the project was opened on another
+        # computer, stays referenced; only removing the image clears it.
+        if self.image_path:
+            self.node.image_name = os.path.basename(self.image_path)
+            self.node.image_widths = list(self.image_widths)
+        else:
+            self.node.image_name = ""
+            self.node.image_widths = []
+
+    def load_node(self):
+        if self.text_edit is not None and self.text_edit.marked_text() != self.node.text:
+            self.text_edit.set_marked_text(self.node.text)
+
+    def release(self):
+        if self.image_label is not None:
+            self.image_label.thumbnail_job = None  # drop a thumbnail still being decoded
+        super().release()
+
+
+class HeaderSection(EditorSection):
+    __slots__ = ("combobox", "text_edit")
+    widget_slots = EditorSection.widget_slots + ("combobox", "text_edit")
+
+    def __init__(self, node):
+        super().__init__(node)
+        self.combobox = None
+        self.text_edit = None
+
+    def sync_node(self):
+        if self.row is not None:
+            self.node.level = self.combobox.currentText()
+            self.node.text = self.text_edit.marked_text()
+
+    def load_node(self):
+        if self.row is not None:
+            self.combobox.setCurrentText(self.node.level)
+            if self.text_edit.marked_text() != self.node.text:
+                self.text_edit.set_marked_text(self.node.text)
+
+
+class ListSection(HeaderSection):
+    __slots__ = ()
+
+    def sync_node(self):
+        if self.row is not None:
+            self.node.list_type = self.combobox.currentText()
+            self.node.text = self.text_edit.marked_text()
+
+    def load_node(self):
+        if self.row is not None:
+            self.combobox.setCurrentText(self.node.list_type)
+            if self.text_edit.marked_text() != self.node.text:
+                self.text_edit.set_marked_text(self.node.text)
+
+
+class YoutubeSection(EditorSection):
+    __slots__ = ("video_edit",)
+    widget_slots = EditorSection.widget_slots + ("video_edit",)
+
+    def __init__(self, node):
+        super().__init__(node)
+        self.video_edit = None
+
+    def sync_node(self):
+        if self.row is not None:
+            self.node.video_id = self.video_edit.text().strip()
+
+    def load_node(self):
+        if self.row is not None and self.video_edit.text().strip() != self.node.video_id:
+            self.video_edit.setText(self.node.video_id)
+
+
+SECTION_TYPES = {"section": PhotoTextSection, "header": HeaderSection, "list": ListSection,
+                 "youtube": YoutubeSection}
+
+
 class HtmlEditor(QMainWindow):
     SETTINGS_FILE = "app_settings.json"
+    AUTOSAVE_DIRECTORY = "autosave"
+    # Edits are coalesced until the user pauses for RENDER_IDLE_MS, but the
+    # output is never more than RENDER_MAX_LATENCY_MS behind while typing.
+    RENDER_IDLE_MS = 150
+    RENDER_MAX_LATENCY_MS = 500
+    # QtWebEngine is only imported when the preview is first needed; this long
+    # after startup it is created in the background anyway (0 disables that).
+    PREVIEW_PREWARM_MS = 3000
+    # Imported images are downscaled to this width (0 keeps the original size)
+    # and encoded as WebP with this quality.
+    IMAGE_MAX_WIDTH = 1920
+    WEBP_QUALITY = 85
+    # Narrower variants offered through srcset, for the images wider than them.
+    IMAGE_VARIANT_WIDTHS = (480, 960, 1440)
+    # Only sections within SECTION_OVERSCAN_PX of the visible part of the
+    # editor have widgets; the rest are represented by two spacers whose
+    # height comes from measured (or, before that, estimated) row heights.
+    SECTION_OVERSCAN_PX = 400
+    SECTION_HEIGHT_ESTIMATE = 200
+    # Undo keeps deltas up to this many bytes; edits of one field less than
+    # HISTORY_COALESCE_SECONDS apart are undone as one step.
+    HISTORY_MAX_BYTES = 4 * 1024 * 1024
+    HISTORY_COALESCE_SECONDS = 1.0
+    # Pastes of at least LARGE_PASTE_CHARS into a section or list are cleaned
+    # up on a worker thread and inserted as one edit; from PASTE_PROGRESS_CHARS
+    # on a progress dialog is shown and the text goes in PASTE_CHUNK_CHARS at a time.
+    LARGE_PASTE_CHARS = 20_000
+    PASTE_PROGRESS_CHARS = 200_000
+    PASTE_CHUNK_CHARS = 50_000
 
     def __init__(self):
         super().__init__()
@@ -37,10 +505,47 @@ class HtmlEditor(QMainWindow):
         self.setWindowIcon(QIcon(icon_path))
 
         self.light_mode = False
+        self.project_path = None
         self.section_direction = True
         self.sections = []
+        self.section_index = {}
+        self.section_offsets = [0]
+        self.section_heights = {}
+        self.visible_sections = []
+        self.refreshing_sections = False
+        self.section_refresh_timer = QTimer(self)
+        self.section_refresh_timer.setSingleShot(True)
+        self.section_refresh_timer.timeout.connect(self.refresh_sections)
+        self.rendered_html = ""
+        # Where each section's fragment sits in rendered_html, by section id.
+        self.fragment_bounds = {}
+        self.revealed_section_id = None
+        self.html_update_pending = False
+        self.html_update_clock = QElapsedTimer()
+        self.html_update_timer = QTimer(self)
+        self.html_update_timer.setSingleShot(True)
+        self.html_update_timer.timeout.connect(self.flush_html)
+        self.image_pipeline = images.ImagePipeline(self)
+        # The pipeline isn't image specific; one worker keeps pastes in order.
+        self.paste_pipeline = images.ImagePipeline(self, max_workers=1)
+        self.journal = journal.AutosaveJournal(self.AUTOSAVE_DIRECTORY)
+        self.history = history.History(self.HISTORY_MAX_BYTES, self.HISTORY_COALESCE_SECONDS)
+        self.profiler = profiling.Profiler()
+        self.stats_dialog = None
+        self.preview_dialog = None
+        self.preview_ready = False
+        self.preview_order = []
+        self.preview_sections = {}
+        self.thumbnail_cache = images.PixmapCache()
+        self.asset_store = images.AssetStore(
+            os.path.join("data", "include", "cms", "img-longdescription"),
+            os.path.join(QStandardPaths.writableLocation(QStandardPaths.StandardLocation.DesktopLocation),
+                         "Zdjecia Opisow Dlugich"),
+            self.IMAGE_MAX_WIDTH, self.WEBP_QUALITY, self.IMAGE_VARIANT_WIDTHS)
         self.stack = QStackedWidget()
         self.setCentralWidget(self.stack)
+        # Images dropped anywhere on the editor become new photo-text sections.
+        self.setAcceptDrops(True)
 
         self.settings = self.load_settings()
 
@@ -61,6 +566,10 @@ class HtmlEditor(QMainWindow):
         )
 
         if reply == QMessageBox.StandardButton.Yes:
+            self.image_pipeline.shutdown()
+            self.paste_pipeline.shutdown()
+            self.asset_store.shutdown()
+            self.journal.close()
             event.accept()
         else:
             event.ignore()
@@ -144,9 +653,15 @@ class HtmlEditor(QMainWindow):
         self.welcome_layout.addWidget(self.welcome_label)
 
         self.start_button = QPushButton("Kliknij aby rozpocząć budowanie nowego opisu :)")
+        themes.set_role(self.start_button, "start")
         self.start_button.clicked.connect(self.show_editor_page)
         self.welcome_layout.addWidget(self.start_button)
 
+        self.open_start_button = QPushButton("Otwórz zapisany projekt")
+        themes.set_role(self.open_start_button, "start")
+        self.open_start_button.clicked.connect(self.open_project)
+        self.welcome_layout.addWidget(self.open_start_button)
+
         self.stack.addWidget(self.welcome_page)
         self.stack.setCurrentWidget(self.welcome_page)
 
@@ -167,60 +682,38 @@ class HtmlEditor(QMainWindow):
         self.scroll_content = QWidget()
         self.scroll_layout = QVBoxLayout()
         self.scroll_content.setLayout(self.scroll_layout)
+        self.top_spacer = QWidget()
+        self.top_spacer.hide()
+        self.scroll_layout.addWidget(self.top_spacer)
+        self.bottom_spacer = QWidget()
+        self.bottom_spacer.hide()
+        self.scroll_layout.addWidget(self.bottom_spacer)
         self.scroll_area.setWidget(self.scroll_content)
+        self.scroll_area.verticalScrollBar().valueChanged.connect(self.refresh_sections)
+        self.scroll_area.viewport().installEventFilter(self)
         self.left_layout.addWidget(self.scroll_area)
 
         self.add_section_button = QPushButton("+ Dodaj Sekcję")
+        themes.set_role(self.add_section_button, "add-section")
         self.add_section_button.clicked.connect(self.add_section)
 
         self.add_header_button = QPushButton("+ Dodaj Nagłówek")
+        themes.set_role(self.add_header_button, "add-header")
         self.add_header_button.clicked.connect(self.add_header)
 
         self.add_ul_button = QPushButton("+ Dodaj Listę")
-        self.add_ul_button.setStyleSheet(
-            "background-color: #870501; color: white; padding: 10px; border-radius: 6px; font-size: 14px;"
-        )
+        themes.set_role(self.add_ul_button, "add-list")
         self.add_ul_button.clicked.connect(lambda: self.add_list("ul"))
 
         self.add_youtube_button = QPushButton("+ Dodaj Film YouTube")
-        self.add_youtube_button.setStyleSheet(
-            "background-color: #d38235; color: white; padding: 10px; border-radius: 6px; font-size: 14px;"
-        )
+        themes.set_role(self.add_youtube_button, "add-youtube")
         self.add_youtube_button.clicked.connect(self.add_youtube_video)
 
         self.dark_mode_toggle_button = QPushButton("")
         self.dark_mode_toggle_button.setFixedSize(30, 90)
         self.dark_mode_toggle_button.clicked.connect(self.toggle_light_mode)
-        if self.light_mode:
-            self.dark_mode_toggle_button.setStyleSheet("""
-                                QPushButton {
-                                    background-color: #555555;
-                                    color: white;
-                                    border: none;
-                                    border-radius: 15px;
-    
-                                    font-size: 20px;
-                                }
-                                QPushButton:hover {
-                                    background-color: #444444;
-                                }
-                            """)
-            self.dark_mode_toggle_button.setText("🌙")
-        else:
-            self.dark_mode_toggle_button.setStyleSheet("""
-                                QPushButton {
-                                    background-color: #cccccc;
-                                    color: black;
-                                    border: none;
-                                    border-radius: 15px;
-
-                                    font-size: 20px;
-                                }
-                                QPushButton:hover {
-                                    background-color: #e6e6e6;
-                                }
-                            """)
-            self.dark_mode_toggle_button.setText("☀️")
+        themes.set_role(self.dark_mode_toggle_button, "theme-toggle")
+        self.dark_mode_toggle_button.setText("🌙" if self.light_mode else "☀️")
 
         self.is_dark_mode = False
 
@@ -252,31 +745,102 @@ class HtmlEditor(QMainWindow):
         self.right_layout = QVBoxLayout()
 
         self.preview_button = QPushButton("Podgląd HTML")
-        self.preview_button.setStyleSheet("""
-                background-color: #6c757d; 
-                color: white; 
-                padding: 10px; 
-                border-radius: 5px;
-            """)
+        themes.set_role(self.preview_button, "preview")
         self.preview_button.clicked.connect(self.show_html_preview)
         self.right_layout.addWidget(self.preview_button)
 
         self.right_widget.setLayout(self.right_layout)
 
-        self.html_edit = QTextEdit()
+        self.fold_checkbox = QCheckBox("Pokaż tylko edytowaną sekcję")
+        self.fold_checkbox.toggled.connect(lambda: self.fold_html_edit())
+        self.right_layout.addWidget(self.fold_checkbox)
+
+        # A plain text edit lays out only what is visible and can hide blocks,
+        # which keeps patching and folding fast on outputs of thousands of lines.
+        self.html_edit = QPlainTextEdit()
         self.html_edit.setReadOnly(True)
+        self.html_edit.setUndoRedoEnabled(False)
+        self.html_highlighter = highlighter.HtmlHighlighter(self.html_edit.document(),
+                                                            themes.HIGHLIGHT[self.light_mode])
         self.right_layout.addWidget(self.html_edit)
+        QApplication.instance().focusChanged.connect(self.focus_changed)
 
         self.copy_html_button = QPushButton("Skopiuj kod HTML")
+        themes.set_role(self.copy_html_button, "copy")
         self.right_layout.addWidget(self.copy_html_button)
         self.copy_html_button.clicked.connect(self.copy_html)
 
+        project_layout = QHBoxLayout()
+        self.open_project_button = QPushButton("Otwórz projekt")
+        themes.set_role(self.open_project_button, "project")
+        self.open_project_button.clicked.connect(self.open_project)
+        project_layout.addWidget(self.open_project_button)
+        self.save_project_button = QPushButton("Zapisz projekt")
+        themes.set_role(self.save_project_button, "project")
+        self.save_project_button.clicked.connect(self.save_project)
+        project_layout.addWidget(self.save_project_button)
+        self.right_layout.addLayout(project_layout)
+
+        QShortcut(QKeySequence(QKeySequence.StandardKey.Open), self).activated.connect(self.open_project)
+        QShortcut(QKeySequence(QKeySequence.StandardKey.Save), self).activated.connect(self.save_project)
+        # Section editors get the same keys through eventFilter, since they
+        # would otherwise take them for their own undo.
+        QShortcut(QKeySequence(QKeySequence.StandardKey.Undo), self).activated.connect(self.undo_action)
+        QShortcut(QKeySequence(QKeySequence.StandardKey.Redo), self).activated.connect(self.redo_action)
+        QShortcut(QKeySequence("Ctrl+Shift+P"), self).activated.connect(self.show_stats_dialog)
+        QShortcut(QKeySequence(QKeySequence.StandardKey.Bold), self).activated.connect(self._safe_toggle_bold)
+        QShortcut(QKeySequence(QKeySequence.StandardKey.Italic), self).activated.connect(self._safe_toggle_italic)
+        QShortcut(QKeySequence(QKeySequence.StandardKey.Underline), self).activated.connect(self._safe_toggle_underline)
+        QShortcut(QKeySequence("Ctrl+Shift+V"), self).activated.connect(self._safe_paste_plain_text)
+
         self.splitter.addWidget(self.right_widget)
         self.splitter.setSizes([700, 300])
 
         self.stack.addWidget(self.editor_page)
 
+        QTimer.singleShot(0, self.restore_autosave)
+
+    def restore_autosave(self):
+        # The journal is kept after closing as well, so the last description
+        # is offered again whether the app crashed or was closed on purpose.
+        try:
+            blocks = journal.recover(self.AUTOSAVE_DIRECTORY)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error reading autosave journal: {e}")
+            blocks = None
+
+        if blocks:
+            reply = QMessageBox.question(
+                self,
+                "Uwaga!",
+                "Znaleziono opis z poprzedniej sesji. Czy chcesz go przywrócić?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.Yes
+            )
+            if reply == QMessageBox.StandardButton.Yes:
+                self.set_blocks(blocks)
+                self.show_editor_page()
+                return
+
+        self.journal.start([section.node for section in self.sections])
+
     def show_html_preview(self):
+        with self.profiler.span("show_html_preview"):
+            self.flush_html()
+            if self.preview_dialog is None:
+                self.create_preview_dialog()
+            self.preview_dialog.show()
+            self.preview_dialog.raise_()
+            self.preview_dialog.activateWindow()
+            self.sync_preview()
+
+    def prewarm_preview(self):
+        if self.preview_dialog is None:
+            self.create_preview_dialog()
+
+    def create_preview_dialog(self):
+        # Created once and kept: the web view loads the page a single time and
+        # afterwards only receives changed sections through runJavaScript.
         self.preview_dialog = QDialog(self)
         self.preview_dialog.setWindowTitle("Podgląd HTML")
         self.preview_dialog.resize(1920, 1080)
@@ -286,226 +850,8 @@ class HtmlEditor(QMainWindow):
         try:
             from PyQt6.QtWebEngineWidgets import QWebEngineView
             self.web_view = QWebEngineView()
-            html_content = self.html_edit.toPlainText()
-
-            style = """
-            <style>
-            .longdescription__template__col.--text,
-                .list_item__col.--text,
-                .longdescription__headline,
-                .longdescription__template__headline {
-                  word-break: break-word; 
-                  overflow-wrap: break-word; 
-                  hyphens: auto; 
-                }
-            body {
-              max-width: 1920px;
-              margin: 0 auto; 
-              width: 90%;
-              
-            }
-            .longdescription {
-              display: flex;
-              flex-direction: column;
-              align-items: center;
-              
-              padding-top: 4.8rem;
-              scroll-margin-top: 11.2rem;
-            }
-            .longdescription__template,
-                .longdescription__template__row.--layout-photo-text {
-                  max-width: 100%; 
-                }
-            @media (min-width: 1024px) {
-              .longdescription {
-                padding-top: 10.2rem;
-                scroll-margin-top: initial;
-              }
-            }
-            .longdescription__template__col img,
-                .longdescription__template__col video {
-                  max-width: 90%;
-                  height: auto;
-                  display: block;
-                }
-                
-            .longdescription.cm {
-              margin-bottom: 0;
-              overflow: initial;
-            }
-            
-            .longdescription > * {
-              width: 100%;
-            }
-            
-            .longdescription > .longdescription__row {
-              order: -2;
-            }
-            
-            .longdescription__headline {
-              font-size: 2.4rem;
-              line-height: 2.4rem;
-              margin-bottom: 3.2rem;
-              text-transform: uppercase;
-              font-weight: 700;
-            }
-            
-            .longdescription__return_info {
-              display: flex;
-              margin-top: 3.2rem;
-            }
-            
-            .longdescription__return_msg {
-              border: 1px solid #ccc;
-              border-radius: 8px;
-              padding: 1.5rem;
-            }
-            
-            .longdescription__template {
-              display: grid;
-              gap: 1.6rem;
-            }
-            
-            @media (min-width: 1024px) {
-              .longdescription__template {
-                gap: 10.2rem;
-                max-width: 1920px;
-              }
-            }
-            
-            .longdescription__template__row.--layout-photo-text {
-              display: grid;
-              gap: 1.6rem;
-            }
-            
-            @media (min-width: 1024px) {
-              .longdescription__template__row.--layout-photo-text {
-                row-gap: 10.2rem;
-              }
-            
-              .longdescription__template__row.--layout-photo-text .row {
-                display: flex;
-                align-items: center;
-                gap: 1.6rem;
-                margin: 0;
-                flex-wrap: wrap;
-              }
-            
-              
-            
-              .longdescription__template__row.--layout-photo-text .row > * {
-                flex: 0 0 calc(50% - 0.8rem);
-                max-width: calc(50% - 0.8rem);
-                 box-sizing: border-box;
-              }
-            }
-            
-            .longdescription__template__col {
-              display: flex;
-              justify-content: center;
-              align-items: center;
-            }
-            
-            .longdescription__template__col img[alt] {
-              background-color: #ccc;
-              padding: 5.6rem;
-              padding-left: 15.6rem;
-              padding-right: 15.6rem;
-              border: 3px dotted #444;
-              color: #white;
-            }
-            
-            .longdescription__template__col.--text {
-              flex-direction: column;
-              align-items: flex-start;
-              justify-content: center;
-              padding: 4.8rem;
-              gap: 1.6rem;
-              font-size: 1.6rem;
-              line-height: 1.8;
-              text-wrap: wrap;
-            }
-            
-            .longdescription__template__col.--text .col__headline {
-              font-size: 1.8rem;
-              font-weight: 600;
-              line-height: 1.3;
-              text-transform: uppercase;
-            }
-            
-            .longdescription__template__col.--text p {
-              margin: 0;
-              line-height: 1.8;
-            }
-            
-            .longdescription__template__headline {
-              font-size: 2.4rem;
-              font-weight: 600;
-              text-align: center;
-              text-transform: uppercase;
-            }
-            
-            .longdescription__template__list {
-              list-style: none;
-              padding-left: 0 !important;
-            }
-            
-            .longdescription__template__list_item {
-              border-top: 1px solid #ccc;
-              margin-top: 3.2rem;
-              padding-top: 3.2rem;
-            }
-            
-            .list_item__row {
-              display: grid;
-              gap: 1.6rem;
-              grid-template-columns: minmax(0, 1fr);
-            }
-            
-            @media (min-width: 1024px) {
-              .list_item__row {
-                gap: 7.2rem;
-                grid-template-columns: auto minmax(0, 1fr);
-              }
-            }
-            
-            .list_item__col.--text {
-              display: grid;
-              gap: 1.6rem;
-            }
-            
-            .list_item__headline {
-              font-size: 1.8rem;
-              font-weight: 600;
-              line-height: 1.8rem;
-              text-transform: uppercase;
-            }
-            
-            .list_item__list {
-              list-style: none;
-              padding: 0;
-            }
-            
-            .list_item__list li {
-              display: flex;
-              align-items: flex-start;
-              justify-content: flex-start;
-            }
-            
-            .list_item__list li::before {
-              content: '•';
-              flex: 0 0 3.2rem;
-              text-align: center;
-            }
-
-            </style>
-            """
-            if "</head>" in html_content:
-                html_content = html_content.replace("</head>", style + "</head>")
-            else:
-                html_content = style + html_content
-
-            self.web_view.setHtml(html_content)
+            self.web_view.loadFinished.connect(self.preview_page_loaded)
+            self.web_view.setHtml(PREVIEW_PAGE)
             layout.addWidget(self.web_view)
         except ImportError:
             error_label = QLabel("Podgląd wymaga zainstalowanego PyQt6-WebEngine")
@@ -517,7 +863,117 @@ class HtmlEditor(QMainWindow):
         layout.addWidget(close_button)
 
         self.preview_dialog.setLayout(layout)
-        self.preview_dialog.exec()
+
+    def show_stats_dialog(self):
+        if self.stats_dialog is None:
+            self.create_stats_dialog()
+        self.refresh_stats()
+        self.stats_dialog.show()
+        self.stats_dialog.raise_()
+        self.stats_dialog.activateWindow()
+
+    def create_stats_dialog(self):
+        self.stats_dialog = QDialog(self)
+        self.stats_dialog.setWindowTitle("Statystyki wydajności")
+        self.stats_dialog.resize(640, 420)
+
+        layout = QVBoxLayout()
+
+        enabled_checkbox = QCheckBox("Zbieraj pomiary")
+        enabled_checkbox.setChecked(self.profiler.enabled)
+        enabled_checkbox.toggled.connect(self.set_profiling_enabled)
+        layout.addWidget(enabled_checkbox)
+
+        self.stats_table = QTableWidget(0, 5)
+        self.stats_table.setHorizontalHeaderLabels(["Operacja", "Wywołania", "p50 [ms]", "p95 [ms]", "max [ms]"])
+        self.stats_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.stats_table.verticalHeader().hide()
+        self.stats_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.stats_table)
+
+        button_layout = QHBoxLayout()
+        clear_button = QPushButton("Wyczyść")
+        clear_button.clicked.connect(self.clear_stats)
+        export_button = QPushButton("Eksportuj ślad...")
+        export_button.clicked.connect(self.export_trace)
+        close_button = QPushButton("Zamknij")
+        close_button.clicked.connect(self.stats_dialog.close)
+        button_layout.addWidget(clear_button)
+        button_layout.addWidget(export_button)
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+
+        self.stats_dialog.setLayout(layout)
+
+        # Refreshed only while the dialog is open.
+        self.stats_timer = QTimer(self.stats_dialog)
+        self.stats_timer.setInterval(1000)
+        self.stats_timer.timeout.connect(self.refresh_stats)
+        self.stats_dialog.finished.connect(self.stats_timer.stop)
+
+    def set_profiling_enabled(self, enabled):
+        self.profiler.enabled = enabled
+        self.refresh_stats()
+
+    def refresh_stats(self):
+        if self.stats_dialog is None:
+            return
+        if self.profiler.enabled and not self.stats_timer.isActive():
+            self.stats_timer.start()
+
+        rows = [(name, str(calls), f"{p50 * 1000:.2f}", f"{p95 * 1000:.2f}", f"{maximum * 1000:.2f}")
+                for name, calls, p50, p95, maximum in self.profiler.stats()]
+        rows += [(name, str(value), "", "", "") for name, value in sorted(self.profiler.counters.items())]
+        self.stats_table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.stats_table.setItem(row, column, item)
+
+    def clear_stats(self):
+        self.profiler.clear()
+        self.refresh_stats()
+
+    def export_trace(self):
+        desktop_path = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.DesktopLocation)
+        path, _ = QFileDialog.getSaveFileName(self.stats_dialog, "Eksportuj ślad",
+                                              os.path.join(desktop_path, "trace.json"), "Chrome trace (*.json)")
+        if not path:
+            return
+        try:
+            self.profiler.export_chrome_trace(path)
+        except OSError as e:
+            QMessageBox.warning(self.stats_dialog, "Uwaga!", f"Nie udało się zapisać śladu:\n{e}")
+
+    def preview_page_loaded(self, ok):
+        self.preview_ready = ok
+        self.preview_order = []
+        self.preview_sections = {}
+        self.sync_preview()
+
+    def sync_preview(self):
+        if not self.preview_ready or not self.preview_dialog.isVisible():
+            return
+
+        order = []
+        sections = {}
+        for section in self.sections:
+            order.append(section.id)
+            sections[section.id] = section.fragment
+
+        changed = {section_id: fragment for section_id, fragment in sections.items()
+                   if self.preview_sections.get(section_id) != fragment}
+        if order == self.preview_order and not changed:
+            return
+
+        # The order is only sent when sections were added, moved or deleted.
+        self.profiler.count("preview sections patched", len(changed))
+        self.web_view.page().runJavaScript(
+            f"previewPatch({json.dumps(order if order != self.preview_order else None)}, {json.dumps(changed)})")
+        self.preview_order = order
+        self.preview_sections = sections
 
     def show_editor_page(self):
         self.stack.setCurrentWidget(self.editor_page)
@@ -527,161 +983,29 @@ class HtmlEditor(QMainWindow):
         self.apply_styles()
         self.save_settings()
 
-        if self.light_mode:
-            self.dark_mode_toggle_button.setStyleSheet("""
-                    QPushButton {
-                        background-color: #555555;
-                        color: white;
-                        border: none;
-                        border-radius: 15px;
-                        
-                        font-size: 20px;
-                    }
-                    QPushButton:hover {
-                        background-color: #444444;
-                    }
-                """)
-            self.dark_mode_toggle_button.setText("🌙")
-            self.slider_animation.setStartValue(self.dark_mode_toggle_button.geometry())
-
-        else:
-            self.dark_mode_toggle_button.setStyleSheet("""
-                    QPushButton {
-                        background-color: #cccccc;
-                        color: black;
-                        border: none;
-                        border-radius: 15px;
-                        
-                        font-size: 20px;
-                    }
-                    QPushButton:hover {
-                        background-color: #e6e6e6;
-                    }
-                """)
-            self.dark_mode_toggle_button.setText("☀️")
-            self.slider_animation.setStartValue(self.dark_mode_toggle_button.geometry())
-
+        self.slider_animation.setStartValue(self.dark_mode_toggle_button.geometry())
         self.slider_animation.start()
 
     def apply_styles(self):
-        # Apply global styles for the main window
-        if self.light_mode:
-            self.setStyleSheet("background-color: white; color: black;")
-        else:
-            self.setStyleSheet("background-color: #2b2b2b; color: white;")
-
-        if hasattr(self, 'preview_button'):
-            self.preview_button.setStyleSheet("""
-                    background-color: #6c757d; 
-                    color: white; 
-                    padding: 10px; 
-                    border-radius: 5px;
-                """ if self.light_mode else """
-                    background-color: #495057; 
-                    color: white; 
-                    padding: 10px; 
-                    border-radius: 5px;
-                """)
-
-        # Update individual buttons
-        if hasattr(self, 'start_button'):
-            self.start_button.setStyleSheet("""
-                background-color: #6395ED; 
-                color: black; 
-                padding: 10px; 
-                border-radius: 5px;
-            """ if self.light_mode else """
-                background-color: #4567BB; 
-                color: white; 
-                padding: 10px; 
-                border-radius: 5px;
-            """)
-
-        if hasattr(self, 'add_section_button'):
-            self.add_section_button.setStyleSheet("""
-                background-color: #198754; 
-                color: black; 
-                padding: 10px; 
-                border-radius: 6px; 
-                font-size: 14px;
-            """ if self.light_mode else """
-                background-color: #28a745; 
-                color: white; 
-                padding: 10px; 
-                border-radius: 6px; 
-                font-size: 14px;
-            """)
-
-        if hasattr(self, 'add_header_button'):
-            self.add_header_button.setStyleSheet("""
-                background-color: #6395ED; 
-                color: black; 
-                padding: 10px; 
-                border-radius: 6px; 
-                font-size: 14px;
-            """ if self.light_mode else """
-                background-color: #4567BB; 
-                color: white; 
-                padding: 10px; 
-                border-radius: 6px; 
-                font-size: 14px;
-            """)
-
-        if hasattr(self, 'add_ul_button'):
-            self.add_ul_button.setStyleSheet("""
-                background-color: orange; 
-                color: black; 
-                padding: 10px; 
-                border-radius: 6px; 
-                font-size: 14px;
-            """ if self.light_mode else """
-                background-color: #e67c00; 
-                color: white; 
-                padding: 10px; 
-                border-radius: 6px; 
-                font-size: 14px;
-            """)
-
-        if hasattr(self, 'add_youtube_button'):
-            self.add_youtube_button.setStyleSheet("""
-                background-color: red; 
-                color: black; 
-                padding: 10px; 
-                border-radius: 6px; 
-                font-size: 14px;
-            """ if self.light_mode else """
-                background-color: #d32f2f; 
-                color: white; 
-                padding: 10px; 
-                border-radius: 6px; 
-                font-size: 14px;
-            """)
-
-        if hasattr(self, 'copy_html_button'):
-            self.copy_html_button.setStyleSheet("""
-                background-color: #6395ED; 
-                color: black; 
-                padding: 10px; 
-                border-radius: 6px; 
-                font-size: 14px;
-            """ if self.light_mode else """
-                background-color: #4567BB; 
-                color: white; 
-                padding: 10px; 
-                border-radius: 6px; 
-                font-size: 14px;
-            """)
-
-        # Update all sections
-        self.update_buttons_theme()
+        with self.profiler.span("apply_styles"):
+            themes.apply_theme(self, self.light_mode)
+            if hasattr(self, 'html_highlighter'):
+                self.html_highlighter.set_colors(themes.HIGHLIGHT[self.light_mode])
+                self.mark_fragment()
+
+        if hasattr(self, 'dark_mode_toggle_button'):
+            self.dark_mode_toggle_button.setText("🌙" if self.light_mode else "☀️")
 
     def copy_html(self):
-        html_content = self.html_edit.toPlainText()
+        self.flush_html()
+        # The rendered string itself; toPlainText() would rebuild it from the
+        # text document and turn non-breaking spaces into plain ones.
+        html_content = self.rendered_html
         clipboard = QApplication.clipboard()
         clipboard.setText(html_content, mode=QClipboard.Mode.Clipboard)
 
         # Change the style and text of the button
-        self.copy_html_button.setStyleSheet("background-color: green; color: white; padding: 10px; border-radius: 5px;")
+        themes.set_state(self.copy_html_button, "copied", True)
         self.copy_html_button.setText("Skopiowano!")
 
         # Reset the button after a delay
@@ -689,340 +1013,339 @@ class HtmlEditor(QMainWindow):
 
     def reset_copy_button(self):
         # Reset button style and text to the default
-        self.copy_html_button.setStyleSheet(
-            "background-color: #6395ED; color: white; padding: 10px; border-radius: 5px;"
-        )
+        themes.set_state(self.copy_html_button, "copied", False)
         self.copy_html_button.setText("Skopiuj kod HTML")
 
-    def update_buttons_theme(self):
-        for section in self.sections:
-            if section[1] == "section":
-                # Unpack section layout
-                _, _, label, text_edit, buttons_widget, _ = section
-
-                # Update styles for QTextEdit
-                text_edit.setStyleSheet("""
-                    background-color: #e9ecef; 
-                    color: black; 
-                    border-radius: 5px; 
-                    padding: 5px;
-                """ if self.light_mode else """
-                    background-color: #222; 
-                    color: white; 
-                    border-radius: 5px; 
-                    padding: 5px;
-                """)
-
-                # Update draggable label color
-                label.setStyleSheet("""
-                    border: 2px dashed gray; padding: 20px; background-color: #e9ecef; color: black;
-                """ if self.light_mode else """
-                    border: 2px dashed gray; padding: 20px; background-color: #444; color: white;
-                """)
-
-                # Update styles for buttons inside section
-                for button in buttons_widget.findChildren(QPushButton):
-                    if button.text() == "Usuń Sekcję":
-                        button.setStyleSheet("""
-                            background-color: #FF4C4C; 
-                            color: black; 
-                            padding: 5px; 
-                            border-radius: 5px;
-                        """ if self.light_mode else """
-                            background-color: #FF4C4C; 
-                            color: white; 
-                            padding: 5px; 
-                            border-radius: 5px;
-                        """)
-                    elif button.text() == "Zamień Kolejność":
-                        button.setStyleSheet("""
-                            background-color: #FFC107; 
-                            color: black; 
-                            padding: 5px; 
-                            border-radius: 5px;
-                        """ if self.light_mode else """
-                            background-color: #FFC107; 
-                            color: black; 
-                            padding: 5px; 
-                            border-radius: 5px;
-                        """)
-                    elif button.text() == "↑":
-                        button.setStyleSheet("""
-                            background-color: #6395ED; 
-                            color: black; 
-                            font-weight: bold;
-                            padding: 5px; 
-                            border-radius: 5px;
-                        """ if self.light_mode else """
-                            background-color: #4567BB; 
-                            color: white; 
-                            font-weight: bold;
-                            padding: 5px; 
-                            border-radius: 5px;
-                        """)
-                    elif button.text() == "↓":
-                        button.setStyleSheet("""
-                            background-color: #6395ED; 
-                            color: black; 
-                            font-weight: bold;
-                            padding: 5px; 
-                            border-radius: 5px;
-                        """ if self.light_mode else """
-                            background-color: #4567BB; 
-                            color: white; 
-                            font-weight: bold;
-                            padding: 5px; 
-                            border-radius: 5px;
-                        """)
-
-            elif section[1] == "header":
-                combobox, text_edit = section[2], section[3]
-
-                # Header text field style
-                text_edit.setStyleSheet("""
-                    background-color: #e9ecef; 
-                    color: black; 
-                    border-radius: 5px; 
-                    padding: 5px;
-                """ if self.light_mode else """
-                    background-color: #222; 
-                    color: white; 
-                    border-radius: 5px; 
-                    padding: 5px;
-                """)
-
-                # Combobox style (header dropdown like H1, H2, etc.)
-                combobox.setStyleSheet("""
-                                    QComboBox {
-                                        background-color: #e9ecef; 
-                                        color: black; 
-
-                                        padding: 10px; 
-                                        font-size: 14px;
-                                    }
-                                    QComboBox QAbstractItemView {
-                                        background-color: white; 
-                                        color: black; 
-                                        selection-background-color: #f0f0f0; 
-                                        selection-color: black;
-                                    }
-
-                                """ if self.light_mode else """
-                                    QComboBox {
-                                        background-color: #222; 
-                                        color: white; 
-
-                                        padding: 10px; 
-                                        font-size: 14px;
-                                    }
-                                    QComboBox QAbstractItemView {
-                                        background-color: #2b2b2b; 
-                                        color: white; 
-                                        selection-background-color: #444; 
-                                        selection-color: white;
-                                    }
-
-                                """)
-
-            elif section[1] == "youtube":
-                video_edit, thumbnail_url_edit, alt_text_edit = section[2:]
-
-                # YouTube video fields
-                for field in [video_edit, thumbnail_url_edit, alt_text_edit]:
-                    field.setStyleSheet("""
-                        background-color: #e9ecef; 
-                        color: black; 
-                        padding: 5px; 
-                        border-radius: 5px;
-                    """ if self.light_mode else """
-                        background-color: #222; 
-                        color: white; 
-                        padding: 5px; 
-                        border-radius: 5px;
-                    """)
-
-            elif section[1] == "list":
-                combobox, text_edit = section[2], section[3]
-
-                # List text edit
-                text_edit.setStyleSheet("""
-                    background-color: #e9ecef; 
-                    color: black; 
-                    border-radius: 5px; 
-                    padding: 5px;
-                """ if self.light_mode else """
-                    background-color: #222; 
-                    color: white; 
-                    border-radius: 5px; 
-                    padding: 5px;
-                """)
-
-                # Combobox (dropdown list style)
-                combobox.setStyleSheet("""
-                    QComboBox {
-                        background-color: #e9ecef; 
-                        color: black; 
-                        
-                        padding: 10px; 
-                        font-size: 14px;
-                    }
-                    QComboBox QAbstractItemView {
-                        background-color: white; 
-                        color: black; 
-                        selection-background-color: #f0f0f0; 
-                        selection-color: black;
-                    }
-
-                """ if self.light_mode else """
-                    QComboBox {
-                        background-color: #222; 
-                        color: white; 
-                        
-                        padding: 10px; 
-                        font-size: 14px;
-                    }
-                    QComboBox QAbstractItemView {
-                        background-color: #2b2b2b; 
-                        color: white; 
-                        selection-background-color: #444; 
-                        selection-color: white;
-                    }
-
-                """)
-
-
-            # elif section[1] == "youtube":
-            #     video_id_edit, thumbnail_url_edit, alt_text_edit = section[2], section[3], section[4]
-            #
-            #     video_id_edit.setStyleSheet("""
-            #         background-color: #e9ecef;
-            #         color: black;
-            #         padding: 5px;
-            #     """ if self.light_mode else """
-            #         background-color: #222;
-            #         color: white;
-            #         padding: 5px;
-            #     """)
-            #
-            #     thumbnail_url_edit.setStyleSheet("""
-            #         background-color: #e9ecef;
-            #         color: black;
-            #         padding: 5px;
-            #     """ if self.light_mode else """
-            #         background-color: #222;
-            #         color: white;
-            #         padding: 5px;
-            #     """)
-            #
-            #     alt_text_edit.setStyleSheet("""
-            #         background-color: #e9ecef;
-            #         color: black;
-            #         padding: 5px;
-            #     """ if self.light_mode else """
-            #         background-color: #222;
-            #         color: white;
-            #         padding: 5px;
-            #     """)
-
-            elif section[1] == "list":
-                combobox, text_edit = section[2], section[3]
-
-                text_edit.setStyleSheet("""
-                    background-color: #e9ecef; 
-                    color: black; 
-                    border-radius: 5px; 
-                    padding: 5px;
-                """ if self.light_mode else """
-                    background-color: #222; 
-                    color: white; 
-                    border-radius: 5px; 
-                    padding: 5px;
-                """)
-
-                combobox.setStyleSheet("""
-                    background-color: #f0f0f0; 
-                    color: black; 
-                    border: 1px solid #ccc;
-                """ if self.light_mode else """
-                    background-color: #444; 
-                    color: white; 
-                    border: 1px solid #666;
-                """)
-
-    def swap_section_direction(self, section_layout):
-        for i, section in enumerate(self.sections):
-            if section[0] == section_layout:
-                layout, section_type, image_label, text_edit, buttons_widget, direction = section
-
-                for j in reversed(range(section_layout.count())):
-                    item = section_layout.itemAt(j)
-                    widget = item.widget()
-                    if widget and widget != buttons_widget:
-                        widget.setParent(None)
-
-                if direction:
-                    section_layout.insertWidget(0, text_edit)
-                    section_layout.insertWidget(1, image_label)
-                else:
-                    section_layout.insertWidget(0, image_label)
-                    section_layout.insertWidget(1, text_edit)
+    def swap_section_direction(self, section_id):
+        section = self.sections[self.section_index[section_id]]
+        section.node.image_first = not section.node.image_first
+        self.history.push(history.FieldEdit(section.id, "image_first", not section.node.image_first,
+                                            section.node.image_first))
+        self.arrange_section_row(section)
+        self.invalidate_section(section)
+        self.update_html()
+
+    def arrange_section_row(self, section):
+        if section.row is not None:
+            section.layout.removeWidget(section.image_label)
+            section.layout.removeWidget(section.text_edit)
+            if section.node.image_first:
+                section.layout.insertWidget(0, section.image_label)
+                section.layout.insertWidget(1, section.text_edit)
+            else:
+                section.layout.insertWidget(0, section.text_edit)
+                section.layout.insertWidget(1, section.image_label)
+
+    def append_section(self, section):
+        self.insert_section(len(self.sections), section)
+        self.history.push(history.InsertBlock(len(self.sections) - 1, section.node))
+
+    def insert_section(self, index, section):
+        self.sections.insert(index, section)
+        self.reindex_sections(index)
+        self.section_refresh_timer.start(0)
+
+    def remove_section(self, index):
+        section = self.sections.pop(index)
+        del self.section_index[section.id]
+        self.reindex_sections(index)
+        if section in self.visible_sections:
+            self.visible_sections.remove(section)
+            self.release_section(section)
+        self.refresh_sections()
+        return section
+
+    def new_section(self, block):
+        section = SECTION_TYPES[block.kind](block)
+        if block.kind == "section" and block.image_name:
+            section.image_path = os.path.join(self.asset_store.directory, block.image_name)
+            section.image_widths = list(block.image_widths)
+        return section
+
+    def reindex_sections(self, start=0):
+        for index in range(start, len(self.sections)):
+            self.section_index[self.sections[index].id] = index
+
+    def eventFilter(self, obj, event):
+        if obj is self.scroll_area.viewport() and event.type() == QEvent.Type.Resize:
+            self.section_refresh_timer.start(0)
+        elif event.type() == QEvent.Type.KeyPress:
+            if event.matches(QKeySequence.StandardKey.Undo):
+                self.undo_action()
+                return True
+            if event.matches(QKeySequence.StandardKey.Redo):
+                self.redo_action()
+                return True
+        return super().eventFilter(obj, event)
+
+    def section_height(self, section):
+        if section.height is not None:
+            return section.height
+        return self.section_heights.get(section.kind, self.SECTION_HEIGHT_ESTIMATE)
+
+    def update_section_offsets(self):
+        spacing = self.scroll_layout.spacing()
+        self.section_offsets = [0]
+        self.section_offsets.extend(itertools.accumulate(
+            self.section_height(section) + spacing for section in self.sections))
+
+    def refresh_sections(self):
+        """ Create widgets for the sections near the viewport and release all others. """
+        if self.refreshing_sections:
+            return  # resizing the spacers below moves the scroll bar
+        self.refreshing_sections = True
+        try:
+            self.section_refresh_timer.stop()
+            self.update_section_offsets()
+            offsets = self.section_offsets
+            top = self.scroll_area.verticalScrollBar().value() - self.SECTION_OVERSCAN_PX
+            bottom = top + self.scroll_area.viewport().height() + 2 * self.SECTION_OVERSCAN_PX
+            first = max(bisect.bisect_right(offsets, top) - 1, 0)
+            last = min(bisect.bisect_left(offsets, bottom), len(self.sections))
+            visible = self.sections[first:last]
+
+            visible_ids = {section.id for section in visible}
+            for section in self.visible_sections:
+                if section.id not in visible_ids:
+                    self.release_section(section)
+            for section in visible:
+                if section.row is None:
+                    self.materialize_section(section)
+            if [section.id for section in visible] != [section.id for section in self.visible_sections]:
+                for section in visible:
+                    self.scroll_layout.removeWidget(section.row)
+                for position, section in enumerate(visible, start=1):
+                    self.scroll_layout.insertWidget(position, section.row)
+            self.visible_sections = visible
+
+            measured = False
+            for section in visible:
+                section.row.ensurePolished()
+                height = section.row.sizeHint().height()
+                if height != section.height:
+                    section.height = self.section_heights[section.kind] = height
+                    measured = True
+            if measured:
+                self.update_section_offsets()
+                offsets = self.section_offsets
+                # Heights differ from the estimate; window again with the real ones.
+                self.section_refresh_timer.start(0)
+
+            spacing = self.scroll_layout.spacing()
+            self.resize_spacer(self.top_spacer, offsets[first] - spacing)
+            self.resize_spacer(self.bottom_spacer, offsets[-1] - offsets[last] - spacing)
+        finally:
+            self.refreshing_sections = False
+
+    def resize_spacer(self, spacer, height):
+        if height > 0:
+            spacer.setFixedHeight(height)
+            spacer.show()
+        else:
+            spacer.hide()
+
+    def materialize_section(self, section):
+        with self.profiler.span("materialize_section"):
+            # build_section_row, build_header_row, build_list_row or build_youtube_row
+            layout = getattr(self, f"build_{section.kind}_row")(section)
+            section.row = QWidget()
+            section.row.setLayout(layout)
+            section.layout = layout
+
+    def release_section(self, section):
+        if section.row is None:
+            return
+        self.sync_section(section)
+        row = section.row
+        section.release()
+        self.scroll_layout.removeWidget(row)
+        row.deleteLater()
+
+    def add_section(self):
+        section = PhotoTextSection(document.Section(image_first=self.section_direction))
+        self.section_direction = not self.section_direction
+        self.append_section(section)
+        self.update_html()
 
-                section_layout.addWidget(buttons_widget)
-                self.sections[i] = (section_layout, section_type, image_label, text_edit, buttons_widget, not direction)
+    @staticmethod
+    def image_paths(mime_data):
+        """ Local image files among dropped URLs, in the order they were dropped. """
+        return [url.toLocalFile() for url in mime_data.urls()
+                if url.isLocalFile() and url.toLocalFile().lower().endswith(images.IMAGE_EXTENSIONS)]
 
-                self.update_html()
+    def dragEnterEvent(self, event):
+        if self.stack.currentWidget() is self.editor_page and self.image_paths(event.mimeData()):
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        paths = self.image_paths(event.mimeData())
+        if self.stack.currentWidget() is self.editor_page and paths:
+            event.acceptProposedAction()
+            self.import_images(paths)
+
+    def import_images(self, paths, after=None):
+        """ Add a photo-text section per image, after the section after or at the end.
+
+        All images are encoded on the worker pool at once and each section is
+        inserted as soon as its image is done, in the place it would have had
+        if all of them had finished in order.
+        """
+        anchor_id = after.id if after is not None else self.sections[-1].id if self.sections else None
+        batch = [None] * len(paths)  # ids of the sections inserted so far, by position
+        for position, path in enumerate(paths):
+            block = document.Section(image_first=self.section_direction)
+            self.section_direction = not self.section_direction
+            started = time.perf_counter()
+            self.image_pipeline.submit(
+                lambda future, position=position, block=block, started=started:
+                    self.dropped_image_imported(batch, position, anchor_id, block, future, started),
+                self.profiler.wrap("images.import_image", images.import_image),
+                self.asset_store, path, images.THUMBNAIL_SIZE, self.thumbnail_cache)
+
+    def dropped_image_imported(self, batch, position, anchor_id, block, future, started):
+        self.profiler.add("import_image", started, time.perf_counter())
+        try:
+            encoded, (digest, image) = future.result()
+        except Exception as e:
+            print(f"Error during import_images: {e}")
+            return
+        if image is not None:
+            # Cached before the label exists, so it shows the thumbnail right away.
+            self.thumbnail_cache.put(digest, QPixmap.fromImage(image))
+
+        # Right after the nearest earlier image of the drop that is already in,
+        # else before the nearest later one, else after the anchor.
+        index = None
+        for earlier_id in reversed(batch[:position]):
+            if earlier_id in self.section_index:
+                index = self.section_index[earlier_id] + 1
                 break
+        else:
+            for later_id in batch[position + 1:]:
+                if later_id in self.section_index:
+                    index = self.section_index[later_id]
+                    break
+        if index is None:
+            index = self.section_index[anchor_id] + 1 if anchor_id in self.section_index else len(self.sections)
+
+        section = PhotoTextSection(block)
+        section.image_path = encoded.paths[-1]
+        section.image_summary = encoded.summary()
+        section.image_widths = encoded.widths
+        section.sync_node()  # so the insert is recorded with its image, as one undo step
+        batch[position] = section.id
+        self.insert_section(index, section)
+        self.history.push(history.InsertBlock(index, section.node))
+        self.update_html()
 
-    def add_section(self):
+    def add_header(self):
+        self.append_section(HeaderSection(document.Header()))
+        self.update_html()
+
+    def add_youtube_video(self):
+        self.append_section(YoutubeSection(document.YoutubeVideo()))
+        self.update_html()
+
+    def add_list(self, list_type):
+        self.append_section(ListSection(document.List(list_type)))
+        self.update_html()
+
+    def set_blocks(self, blocks):
+        """ Replace the whole document; widgets are only created as sections scroll into view. """
+        for section in self.visible_sections:
+            self.release_section(section)
+        self.visible_sections = []
+        self.sections = []
+        self.section_index = {}
+        for block in blocks:
+            section = self.new_section(block)
+            if block.kind == "section":
+                self.section_direction = not block.image_first
+            self.section_index[section.id] = len(self.sections)
+            self.sections.append(section)
+        self.history.clear()
+        self.journal.start(blocks)
+        self.scroll_area.verticalScrollBar().setValue(0)
+        self.refresh_sections()
+        self.update_html()
+
+    def save_project(self):
+        path = self.project_path
+        if path is None:
+            desktop_path = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.DesktopLocation)
+            path, _ = QFileDialog.getSaveFileName(self, "Zapisz projekt", desktop_path, "Projekt opisu (*.json)")
+            if not path:
+                return
+            if not path.endswith(".json"):
+                path += ".json"
+
+        self.sync_visible_sections()
+        try:
+            document.save_project(path, [section.node for section in self.sections])
+        except OSError as e:
+            QMessageBox.warning(self, "Uwaga!", f"Nie udało się zapisać projektu:\n{e}")
+            return
+        self.project_path = path
+
+    def open_project(self):
+        if self.sections:
+            reply = QMessageBox.question(
+                self,
+                "Uwaga!",
+                "Otworzenie projektu zastąpi obecny opis. Kontynuować?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.No
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+
+        desktop_path = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.DesktopLocation)
+        path, _ = QFileDialog.getOpenFileName(self, "Otwórz projekt", desktop_path, "Projekt opisu (*.json)")
+        if not path:
+            return
+        try:
+            blocks = document.load_project(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            QMessageBox.warning(self, "Uwaga!", f"Nie udało się otworzyć projektu:\n{e}")
+            return
+
+        self.project_path = path
+        self.set_blocks(blocks)
+        self.show_editor_page()
+
+    def build_section_row(self, section):
+        node = section.node
         section_layout = QHBoxLayout()
 
-        image_label = self.DraggableLabel(editor=self)
-        image_label.setStyleSheet(
-            "border: 2px dashed gray; padding: 20px; background-color: #e9ecef; color: black;" if self.light_mode else
-            "border: 2px dashed gray; padding: 20px; background-color: #444; color: white;"
-        )
+        image_label = self.DraggableLabel(self, section)
+        themes.set_role(image_label, "drop")
 
-        text_edit = QTextEdit()
+        text_edit = self.ArrowTextEdit()
 
         text_edit.setPlaceholderText("Wpisz treść paragrafu...")
+        text_edit.set_marked_text(node.text)
+        text_edit.setUndoRedoEnabled(False)
+        text_edit.installEventFilter(self)
+        text_edit.textChanged.connect(lambda: self.invalidate_section(section))
         text_edit.textChanged.connect(self.update_html)
-        text_edit.setStyleSheet("""
-            background-color: #e9ecef; color: black; border-radius: 5px; padding: 5px;
-        """ if self.light_mode else """
-            background-color: #222; color: white; border-radius: 5px; padding: 5px;
-        """)
+        text_edit.large_paste.connect(lambda text: self.paste_large_text(section, text))
+        themes.set_role(text_edit, "editor")
 
         delete_button = QPushButton("Usuń Sekcję")
-        delete_button.setStyleSheet("""
-            background-color: #FF4C4C; color: black; padding: 5px; border-radius: 5px;
-        """ if self.light_mode else """
-            background-color: #FF4C4C; color: white; padding: 5px; border-radius: 5px;
-        """)
-        delete_button.clicked.connect(lambda: self.delete_section(section_layout))
+        themes.set_role(delete_button, "delete")
+        delete_button.clicked.connect(lambda: self.delete_section(section.id))
 
         swap_button = QPushButton("Zamień Kolejność")
-        swap_button.setStyleSheet("""
-            background-color: #FFC107; color: black; padding: 5px; border-radius: 5px;
-        """ if self.light_mode else """
-            background-color: #FFC107; color: black; padding: 5px; border-radius: 5px;
-        """)
-        swap_button.clicked.connect(lambda: self.swap_section_direction(section_layout))
+        themes.set_role(swap_button, "swap")
+        swap_button.clicked.connect(lambda: self.swap_section_direction(section.id))
 
         move_up_button = QPushButton("↑")
-        move_up_button.setStyleSheet("""
-            background-color: #6395ED; color: black; padding: 5px; border-radius: 5px; font-weight: bold;
-        """ if self.light_mode else """
-            background-color: #4567BB; color: white; padding: 5px; border-radius: 5px; font-weight: bold;
-        """)
-        move_up_button.clicked.connect(lambda: self.move_section(section_layout, -1))
+        themes.set_role(move_up_button, "move")
+        move_up_button.clicked.connect(lambda: self.move_section(section.id, -1))
 
         move_down_button = QPushButton("↓")
-        move_down_button.setStyleSheet("""
-            background-color: #6395ED; color: black; padding: 5px; border-radius: 5px; font-weight: bold;
-        """ if self.light_mode else """
-            background-color: #4567BB; color: white; padding: 5px; border-radius: 5px; font-weight: bold;
-        """)
-        move_down_button.clicked.connect(lambda: self.move_section(section_layout, 1))
+        themes.set_role(move_down_button, "move")
+        move_down_button.clicked.connect(lambda: self.move_section(section.id, 1))
 
         buttons_layout = QVBoxLayout()
         buttons_layout.addWidget(swap_button)
@@ -1032,38 +1355,7 @@ class HtmlEditor(QMainWindow):
         buttons_widget = QWidget()
         buttons_widget.setLayout(buttons_layout)
 
-        def handle_key_press(event):
-            cursor = text_edit.textCursor()
-
-            if event.key() == Qt.Key.Key_Tab:
-                current_line = cursor.block().text()
-                cursor_pos_in_block = cursor.positionInBlock()
-
-                if cursor_pos_in_block == 0 or (cursor_pos_in_block > 0 and current_line[
-                                                                            :cursor_pos_in_block].strip() == "⤷" * cursor_pos_in_block):
-
-                    red_format = QTextCharFormat()
-                    red_format.setForeground(QColor("red"))
-                    cursor.insertText("⤷", red_format)
-                    cursor.setCharFormat(QTextCharFormat())
-                    text_edit.setTextCursor(cursor)
-                else:
-                    cursor.insertText("    ")
-                return True
-
-            return False
-
-        text_edit.installEventFilter(self)
-
-        def eventFilter(obj, event):
-            if obj == text_edit and event.type() == QEvent.Type.KeyPress:
-                if handle_key_press(event):
-                    return True
-            return super(type(self), self).eventFilter(obj, event)
-
-        self.eventFilter = eventFilter
-
-        if self.section_direction:
+        if node.image_first:
             section_layout.addWidget(image_label)
             section_layout.addWidget(text_edit)
         else:
@@ -1071,57 +1363,46 @@ class HtmlEditor(QMainWindow):
             section_layout.addWidget(image_label)
 
         section_layout.addWidget(buttons_widget)
-        self.scroll_layout.addLayout(section_layout)
 
-        self.sections.append(
-            (section_layout, "section", image_label, text_edit, buttons_widget, self.section_direction))
-        self.section_direction = not self.section_direction
-
-
-
-        self.update_html()
+        section.image_label = image_label
+        section.text_edit = text_edit
+        section.buttons_widget = buttons_widget
+        image_label.show_image()
+        return section_layout
 
-    def add_header(self):
+    def build_header_row(self, section):
+        node = section.node
         header_layout = QHBoxLayout()
         header_types = ["h1", "h2", "h3"]
 
         header_combobox = QComboBox()
         header_combobox.addItems(header_types)
-        header_combobox.setStyleSheet(
-            "background-color: #e9ecef; color: black; padding: 10px; font-size: 14px;" if self.light_mode else
-            "background-color: #222; color: white; padding: 10px; font-size: 14px;"
-        )
+        header_combobox.setCurrentText(node.level)
+        themes.set_role(header_combobox, "picker")
 
-        header_text_edit = QTextEdit()
+        header_text_edit = richtext.RichTextEdit()
         header_text_edit.setPlaceholderText("Wpisz tekst nagłówka...")
-        header_text_edit.setStyleSheet(
-            "background-color: #e9ecef; color: black; border-radius: 5px; padding: 5px;" if self.light_mode else
-            "background-color: #222; color: white; border-radius: 5px; padding: 5px;"
-        )
+        header_text_edit.set_marked_text(node.text)
+        header_text_edit.setUndoRedoEnabled(False)
+        header_text_edit.installEventFilter(self)
+        themes.set_role(header_text_edit, "editor")
 
+        header_text_edit.textChanged.connect(lambda: self.invalidate_section(section))
         header_text_edit.textChanged.connect(self.update_html)
+        header_combobox.currentTextChanged.connect(lambda: self.invalidate_section(section))
         header_combobox.currentTextChanged.connect(self.update_html)
 
         delete_button = QPushButton("Usuń Sekcję")
-        delete_button.setStyleSheet(
-            "background-color: #FF4C4C; color: black; padding: 5px; border-radius: 5px;" if self.light_mode else
-            "background-color: #FF4C4C; color: white; padding: 5px; border-radius: 5px;"
-        )
-        delete_button.clicked.connect(lambda: self.delete_section(header_layout))
+        themes.set_role(delete_button, "delete")
+        delete_button.clicked.connect(lambda: self.delete_section(section.id))
 
         move_up_button = QPushButton("↑")
-        move_up_button.setStyleSheet(
-            "background-color: #6395ED; color: black; padding: 5px; border-radius: 5px; font-weight: bold;" if self.light_mode else
-            "background-color: #4567BB; color: white; padding: 5px; border-radius: 5px; font-weight: bold;"
-        )
-        move_up_button.clicked.connect(lambda: self.move_section(header_layout, -1))  # Move up
+        themes.set_role(move_up_button, "move")
+        move_up_button.clicked.connect(lambda: self.move_section(section.id, -1))  # Move up
 
         move_down_button = QPushButton("↓")
-        move_down_button.setStyleSheet(
-            "background-color: #6395ED; color: black; padding: 5px; border-radius: 5px; font-weight: bold;" if self.light_mode else
-            "background-color: #4567BB; color: white; padding: 5px; border-radius: 5px; font-weight: bold;"
-        )
-        move_down_button.clicked.connect(lambda: self.move_section(header_layout, 1))  # Move down
+        themes.set_role(move_down_button, "move")
+        move_down_button.clicked.connect(lambda: self.move_section(section.id, 1))  # Move down
 
         buttons_layout = QVBoxLayout()
         buttons_layout.addWidget(move_up_button)
@@ -1134,20 +1415,20 @@ class HtmlEditor(QMainWindow):
         header_layout.addWidget(header_combobox)
         header_layout.addWidget(header_text_edit)
         header_layout.addWidget(buttons_widget)
-        self.scroll_layout.addLayout(header_layout)
 
-        self.sections.append((header_layout, "header", header_combobox, header_text_edit))
-        self.update_html()
+        section.combobox = header_combobox
+        section.text_edit = header_text_edit
+        section.buttons_widget = buttons_widget
+        return header_layout
 
-    def add_youtube_video(self):
+    def build_youtube_row(self, section):
         youtube_layout = QHBoxLayout()
 
         video_id_edit = QLineEdit()
         video_id_edit.setPlaceholderText("Wpisz URL filmu")
-        video_id_edit.setStyleSheet(
-            "background-color: #e9ecef; color: black; padding: 5px; border-radius: 5px;" if self.light_mode else
-            "background-color: #222; color: white; padding: 5px; border-radius: 5px;"
-        )
+        video_id_edit.setText(section.node.video_id)
+        video_id_edit.installEventFilter(self)
+        themes.set_role(video_id_edit, "editor")
         # thumbnail_url_edit = QLineEdit()
         # thumbnail_url_edit.setPlaceholderText("Wpisz URL miniaturki (maxresdefault)")
         # thumbnail_url_edit.setStyleSheet(
@@ -1162,26 +1443,17 @@ class HtmlEditor(QMainWindow):
         # )
 
         delete_button = QPushButton("Usuń Sekcję")
-        delete_button.setStyleSheet(
-            "background-color: #FF4C4C; color: white; padding: 5px; border-radius: 5px;" if self.light_mode else
-            "background-color: #FF4C4C; color: white; padding: 5px; border-radius: 5px;"
-        )
+        themes.set_role(delete_button, "delete")
 
-        delete_button.clicked.connect(lambda: self.delete_section(youtube_layout))
+        delete_button.clicked.connect(lambda: self.delete_section(section.id))
 
         move_up_button = QPushButton("↑")
-        move_up_button.setStyleSheet(
-            "background-color: #6395ED; color: black; padding: 5px; border-radius: 5px; font-weight: bold;" if self.light_mode else
-            "background-color: #4567BB; color: white; padding: 5px; border-radius: 5px; font-weight: bold;"
-        )
-        move_up_button.clicked.connect(lambda: self.move_section(youtube_layout, -1))  # Move up
+        themes.set_role(move_up_button, "move")
+        move_up_button.clicked.connect(lambda: self.move_section(section.id, -1))  # Move up
 
         move_down_button = QPushButton("↓")
-        move_down_button.setStyleSheet(
-            "background-color: #6395ED; color: black; padding: 5px; border-radius: 5px; font-weight: bold;" if self.light_mode else
-            "background-color: #4567BB; color: white; padding: 5px; border-radius: 5px; font-weight: bold;"
-        )
-        move_down_button.clicked.connect(lambda: self.move_section(youtube_layout, 1))  # Move down
+        themes.set_role(move_down_button, "move")
+        move_down_button.clicked.connect(lambda: self.move_section(section.id, 1))  # Move down
 
         youtube_layout.addWidget(video_id_edit)
         # youtube_layout.addWidget(thumbnail_url_edit)
@@ -1196,15 +1468,14 @@ class HtmlEditor(QMainWindow):
         buttons_widget.setLayout(buttons_layout)
         youtube_layout.addWidget(buttons_widget)
         thumbnail_url = ""
-        alt_text = "Film Youtube"
+        video_id_edit.textChanged.connect(lambda: self.invalidate_section(section))
         video_id_edit.textChanged.connect(lambda: self.process_youtube_url(video_id_edit, thumbnail_url))
         # thumbnail_url_edit.textChanged.connect(self.update_html)
         # alt_text_edit.textChanged.connect(self.update_html)
 
-        self.scroll_layout.addLayout(youtube_layout)
-        self.sections.append((youtube_layout, "youtube", video_id_edit, thumbnail_url, alt_text))
-
-        self.update_html()
+        section.video_edit = video_id_edit
+        section.buttons_widget = buttons_widget
+        return youtube_layout
 
     def process_youtube_url(self, video_id_edit, thumbnail_url):
         full_url = video_id_edit.text()
@@ -1216,76 +1487,37 @@ class HtmlEditor(QMainWindow):
         self.update_html()
 
 
-    def add_list(self, list_type):
+    def build_list_row(self, section):
         list_layout = QHBoxLayout()
 
         list_combobox = QComboBox()
         list_combobox.addItems(["ul", "ol"])
-        list_combobox.setCurrentText(list_type)
-        list_combobox.setStyleSheet(
-            "background-color: #e9ecef; color: black; padding: 10px; font-size: 14px;" if self.light_mode else
-            "background-color: #222; color: white; padding: 10px; font-size: 14px;"
-        )
+        list_combobox.setCurrentText(section.node.list_type)
+        themes.set_role(list_combobox, "picker")
+        list_combobox.currentTextChanged.connect(lambda: self.invalidate_section(section))
         list_combobox.currentTextChanged.connect(self.update_html)
 
-        list_text_edit = QTextEdit()
+        list_text_edit = self.ArrowTextEdit()
         list_text_edit.setPlaceholderText("Wpisz elementy listy, każdy w nowej linii...")
-        list_text_edit.textChanged.connect(self.update_html)
-        list_text_edit.setStyleSheet(
-            "background-color: #e9ecef; color: black; border-radius: 5px; padding: 5px;" if self.light_mode else
-            "background-color: #222; color: white; border-radius: 5px; padding: 5px;"
-        )
-
-        def handle_key_press(event):
-            cursor = list_text_edit.textCursor()
-
-            if event.key() == Qt.Key.Key_Tab:
-                current_line = cursor.block().text()
-                cursor_pos_in_block = cursor.positionInBlock()
-
-                if cursor_pos_in_block == 0 or (cursor_pos_in_block > 0 and current_line[:cursor_pos_in_block].strip() == "⤷" * cursor_pos_in_block):
-
-                    red_format = QTextCharFormat()
-                    red_format.setForeground(QColor("red"))
-                    cursor.insertText("⤷", red_format)
-                    cursor.setCharFormat(QTextCharFormat())
-                    list_text_edit.setTextCursor(cursor)
-                else:
-                    cursor.insertText("    ")
-                return True
-
-            return False
-
+        list_text_edit.set_marked_text(section.node.text)
+        list_text_edit.setUndoRedoEnabled(False)
         list_text_edit.installEventFilter(self)
-
-        def eventFilter(obj, event):
-            if obj == list_text_edit and event.type() == QEvent.Type.KeyPress:
-                if handle_key_press(event):
-                    return True
-            return super(type(self), self).eventFilter(obj, event)
-
-        self.eventFilter = eventFilter
+        list_text_edit.textChanged.connect(lambda: self.invalidate_section(section))
+        list_text_edit.textChanged.connect(self.update_html)
+        list_text_edit.large_paste.connect(lambda text: self.paste_large_text(section, text))
+        themes.set_role(list_text_edit, "editor")
 
         delete_button = QPushButton("Usuń Sekcję")
-        delete_button.setStyleSheet(
-            "background-color: #FF4C4C; color: black; padding: 5px; border-radius: 5px;" if self.light_mode else
-            "background-color: #FF4C4C; color: white; padding: 5px; border-radius: 5px;"
-        )
-        delete_button.clicked.connect(lambda: self.delete_section(list_layout))
+        themes.set_role(delete_button, "delete")
+        delete_button.clicked.connect(lambda: self.delete_section(section.id))
 
         move_up_button = QPushButton("↑")
-        move_up_button.setStyleSheet(
-            "background-color: #6395ED; color: black; padding: 5px; border-radius: 5px;" if self.light_mode else
-            "background-color: #4567BB; color: white; padding: 5px; border-radius: 5px;"
-        )
-        move_up_button.clicked.connect(lambda: self.move_section(list_layout, -1))
+        themes.set_role(move_up_button, "move")
+        move_up_button.clicked.connect(lambda: self.move_section(section.id, -1))
 
         move_down_button = QPushButton("↓")
-        move_down_button.setStyleSheet(
-            "background-color: #6395ED; color: black; padding: 5px; border-radius: 5px;" if self.light_mode else
-            "background-color: #4567BB; color: white; padding: 5px; border-radius: 5px;"
-        )
-        move_down_button.clicked.connect(lambda: self.move_section(list_layout, 1))
+        themes.set_role(move_down_button, "move")
+        move_down_button.clicked.connect(lambda: self.move_section(section.id, 1))
 
         buttons_layout = QVBoxLayout()
         buttons_layout.addWidget(move_up_button)
@@ -1298,103 +1530,89 @@ class HtmlEditor(QMainWindow):
         list_layout.addWidget(list_text_edit)
         list_layout.addWidget(buttons_widget)
 
-        self.scroll_layout.addLayout(list_layout)
-
-        self.sections.append((list_layout, "list", list_combobox, list_text_edit))
-        self.update_html()
+        section.combobox = list_combobox
+        section.text_edit = list_text_edit
+        section.buttons_widget = buttons_widget
+        return list_layout
 
-    def move_section(self, section_layout, direction):
-        current_index = None
-        for i, section in enumerate(self.sections):
-            if section[0] == section_layout:
-                current_index = i
-                break
+    def move_section(self, section_id, direction):
+        if self.shift_section(section_id, direction):
+            self.history.push(history.MoveBlock(section_id, direction))
+            self.update_html()
 
+    def shift_section(self, section_id, direction):
+        current_index = self.section_index.get(section_id)
         if current_index is None:
-            return
+            return False
 
         new_index = current_index + direction
 
         if 0 <= new_index < len(self.sections):
-            self.sections.insert(new_index, self.sections.pop(current_index))
-
-            layout_item = self.scroll_layout.takeAt(current_index)
-            widget_to_move = layout_item.layout()
-            self.scroll_layout.insertLayout(new_index, widget_to_move)
-
+            section = self.sections[current_index]
+            neighbour = self.sections[new_index]
+            self.sections[new_index], self.sections[current_index] = section, neighbour
+            self.section_index[section.id] = new_index
+            self.section_index[neighbour.id] = current_index
+
+            self.refresh_sections()
+            return True
+        return False
+
+    def delete_section(self, section_id):
+        section = self.sections[self.section_index[section_id]]
+        if section.row is None:
+            return
+        section_widgets = []
+        for j in range(section.layout.count()):
+            item = section.layout.itemAt(j)
+            widget = item.widget()
+            if widget:
+                section_widgets.append(widget)
+                widget.hide()
+
+        confirmation_layout = QVBoxLayout()
+        confirmation_label = QLabel("Czy na pewno chcesz usunąć tą sekcję?")
+        confirmation_label.setStyleSheet("color: white; font-size: 16px; font-weight: bold;")
+        confirmation_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        confirmation_layout.addWidget(confirmation_label)
+
+        button_layout = QHBoxLayout()
+        yes_button = QPushButton("Tak")
+        no_button = QPushButton("Nie")
+
+        yes_button.setStyleSheet(
+            "background-color: #FF4C4C; color: white; padding: 10px; font-size: 14px; border-radius: 5px;")
+        no_button.setStyleSheet(
+            "background-color: #4CAF50; color: white; padding: 10px; font-size: 14px; border-radius: 5px;")
+
+        button_layout.addWidget(yes_button)
+        button_layout.addWidget(no_button)
+        confirmation_layout.addLayout(button_layout)
+
+        confirmation_widget = QWidget()
+        confirmation_widget.setLayout(confirmation_layout)
+        confirmation_widget.setStyleSheet("background-color: #8f2f2f; padding: 10px; border-radius: 5px;")
+
+        # Shown in place of the section's widgets, so it goes away with the
+        # row if the section is scrolled out of view before an answer.
+        section.layout.addWidget(confirmation_widget)
+
+        def confirm_delete():
+            # Look the index up again: sections may have moved while the prompt was open.
+            index_to_remove = self.section_index.get(section_id)
+            if index_to_remove is None:
+                return
+            self.remove_section(index_to_remove)
+            self.history.push(history.DeleteBlock(index_to_remove, section.node))
             self.update_html()
 
-    def delete_section(self, section_layout):
-        index_to_remove = None
-        for i, section in enumerate(self.sections):
-            if section[0] == section_layout:
-                index_to_remove = i
-                section_widgets = []
-                for j in range(section_layout.count()):
-                    item = section_layout.itemAt(j)
-                    widget = item.widget()
-                    if widget:
-                        section_widgets.append(widget)
-                        widget.hide()
-
-                confirmation_layout = QVBoxLayout()
-                confirmation_label = QLabel("Czy na pewno chcesz usunąć tą sekcję?")
-                confirmation_label.setStyleSheet("color: white; font-size: 16px; font-weight: bold;")
-                confirmation_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                confirmation_layout.addWidget(confirmation_label)
+        def cancel_delete():
+            confirmation_widget.deleteLater()
+            for widget in section_widgets:
+                widget.show()
 
-                button_layout = QHBoxLayout()
-                yes_button = QPushButton("Tak")
-                no_button = QPushButton("Nie")
-
-                yes_button.setStyleSheet(
-                    "background-color: #FF4C4C; color: white; padding: 10px; font-size: 14px; border-radius: 5px;")
-                no_button.setStyleSheet(
-                    "background-color: #4CAF50; color: white; padding: 10px; font-size: 14px; border-radius: 5px;")
-
-                button_layout.addWidget(yes_button)
-                button_layout.addWidget(no_button)
-                confirmation_layout.addLayout(button_layout)
-
-                confirmation_widget = QWidget()
-                confirmation_widget.setLayout(confirmation_layout)
-                confirmation_widget.setStyleSheet("background-color: #8f2f2f; padding: 10px; border-radius: 5px;")
-
-                parent_layout = section_layout.parentWidget().layout()
-                if parent_layout:
-                    confirmation_index = -1
-                    for j in range(parent_layout.count()):
-                        if parent_layout.itemAt(j).layout() == section_layout:
-                            confirmation_index = j
-                            break
-                    if confirmation_index >= 0:
-                        parent_layout.insertWidget(confirmation_index + 1, confirmation_widget)
-
-                def confirm_delete():
-                    if index_to_remove is not None:
-                        self.sections.pop(index_to_remove)
-                    for i in range(self.scroll_layout.count()):
-                        item = self.scroll_layout.itemAt(i)
-                        if item.layout() == section_layout:
-                            layout_item = self.scroll_layout.takeAt(i)
-                            while section_layout.count():
-                                item = section_layout.takeAt(0)
-                                widget = item.widget()
-                                if widget:
-                                    widget.deleteLater()
-                            del layout_item
-                            break
-                    confirmation_widget.deleteLater()
-                    self.update_html()
-
-                def cancel_delete():
-                    confirmation_widget.deleteLater()
-                    for widget in section_widgets:
-                        widget.show()
-
-                yes_button.clicked.connect(confirm_delete)
-                no_button.clicked.connect(cancel_delete)
-                return
+        yes_button.clicked.connect(confirm_delete)
+        no_button.clicked.connect(cancel_delete)
 
     def _get_focused_text_edit(self):
         try:
@@ -1405,309 +1623,458 @@ class HtmlEditor(QMainWindow):
         except:
             return None
 
+    # Only the toggled property is merged, so e.g. the red of a ⤷ is kept, and
+    # mergeCurrentCharFormat also applies it to the next typed text when
+    # nothing is selected.
     def _safe_toggle_bold(self):
         if editor := self._get_focused_text_edit():
-            cursor = editor.textCursor()
-            fmt = cursor.charFormat()
-            fmt.setFontWeight(QFont.Weight.Bold if fmt.fontWeight() != QFont.Weight.Bold
-                              else QFont.Weight.Normal)
-            cursor.mergeCharFormat(fmt)
+            fmt = QTextCharFormat()
+            bold = editor.currentCharFormat().fontWeight() >= richtext.BOLD_WEIGHT
+            fmt.setFontWeight(QFont.Weight.Normal if bold else QFont.Weight.Bold)
+            editor.mergeCurrentCharFormat(fmt)
 
     def _safe_toggle_italic(self):
         if editor := self._get_focused_text_edit():
-            cursor = editor.textCursor()
-            fmt = cursor.charFormat()
-            fmt.setFontItalic(not fmt.fontItalic())
-            cursor.mergeCharFormat(fmt)
+            fmt = QTextCharFormat()
+            fmt.setFontItalic(not editor.currentCharFormat().fontItalic())
+            editor.mergeCurrentCharFormat(fmt)
 
     def _safe_toggle_underline(self):
         if editor := self._get_focused_text_edit():
-            cursor = editor.textCursor()
-            fmt = cursor.charFormat()
-            fmt.setFontUnderline(not fmt.fontUnderline())
-            cursor.mergeCharFormat(fmt)
+            fmt = QTextCharFormat()
+            fmt.setFontUnderline(not editor.currentCharFormat().fontUnderline())
+            editor.mergeCurrentCharFormat(fmt)
 
     def _safe_paste_plain_text(self):
         if editor := self._get_focused_text_edit():
-            editor.insertPlainText(QApplication.clipboard().text())
-
-    def register_shortcuts(self):
-        # Keep Ctrl+Z as is
-        QShortcut(QKeySequence("Ctrl+Z"), self).activated.connect(self.undo_action)
-
-        # Formatting shortcuts - will work on any focused QTextEdit that isn't html_edit
-        QShortcut(QKeySequence("Ctrl+B"), self).activated.connect(
-            self._safe_toggle_bold
-        )
-        QShortcut(QKeySequence("Ctrl+I"), self).activated.connect(
-            self._safe_toggle_italic
-        )
-        QShortcut(QKeySequence("Ctrl+U"), self).activated.connect(
-            self._safe_toggle_underline
-        )
-        QShortcut(QKeySequence("Ctrl+Shift+V"), self).activated.connect(
-            self._safe_paste_plain_text
-        )
-
-    def paste_plain_text_to_focused_widget(self):
-        focused_widget = QApplication.focusWidget()
-        if isinstance(focused_widget, (QTextEdit, QLineEdit)):
-            clipboard = QApplication.clipboard()
-            plain_text = clipboard.text(QClipboard.Mode.Clipboard)
-            focused_widget.insertPlainText(plain_text)
+            # Through insertFromMimeData, so large pastes take the same path as Ctrl+V.
+            mime_data = QMimeData()
+            mime_data.setText(QApplication.clipboard().text())
+            editor.insertFromMimeData(mime_data)
+
+    def paste_large_text(self, section, text):
+        """ Clean up a big paste on a worker thread, then insert it with one render and one undo step. """
+        editor = section.text_edit
+        cursor = editor.textCursor()
+        # Nothing else may be typed until the paste is in, or the positions would move.
+        editor.setReadOnly(True)
+        progress = None
+        if len(text) >= self.PASTE_PROGRESS_CHARS:
+            progress = QProgressDialog(self)
+            progress.setLabelText("Wklejanie tekstu...")
+            progress.setCancelButton(None)
+            progress.setRange(0, 0)
+            progress.setWindowModality(Qt.WindowModality.WindowModal)
+            progress.setMinimumDuration(0)
+            progress.show()
+        started = time.perf_counter()
+        start, end = cursor.selectionStart(), cursor.selectionEnd()
+        self.paste_pipeline.submit(
+            lambda future: self.large_paste_normalized(section, start, end, future, progress, started),
+            self.profiler.wrap("normalize_pasted_text", document.normalize_pasted_text), text)
+
+    def large_paste_normalized(self, section, start, end, future, progress, started):
+        index = self.section_index.get(section.id)
+        if index is None or self.sections[index] is not section:
+            if progress is not None:
+                progress.close()
+            return  # deleted in the meantime
+        if section.text_edit is None:
+            self.scroll_to_section(section)
+        editor = section.text_edit
 
-    def _toggle_text_format(self, editor, format_type):
-        if editor is None:
+        try:
+            text = future.result()
+        except Exception as e:
+            editor.setReadOnly(False)
+            if progress is not None:
+                progress.close()
+            QMessageBox.warning(self, "Uwaga!", f"Nie udało się wkleić tekstu:\n{e}")
             return
-
         cursor = editor.textCursor()
-        fmt = cursor.charFormat()
+        # e.g. an undo could have shortened the text meanwhile
+        last = editor.document().characterCount() - 1
+        cursor.setPosition(min(start, last))
+        cursor.setPosition(min(end, last), QTextCursor.MoveMode.KeepAnchor)
+        chunks = [text[i:i + self.PASTE_CHUNK_CHARS] for i in range(0, len(text), self.PASTE_CHUNK_CHARS)] or [""]
+        if progress is not None:
+            progress.setRange(0, len(chunks))
+
+        # textChanged is held back until the whole text is in, so the section
+        # is rendered, and recorded for undo, once.
+        editor.blockSignals(True)
+
+        def insert_chunk(i):
+            # Pasted text never takes over the format in front of it, e.g. a red ⤷.
+            cursor.insertText(chunks[i], QTextCharFormat())
+            if i + 1 < len(chunks) and progress is not None:
+                progress.setValue(i + 1)
+                # Between chunks the progress dialog gets repainted.
+                QTimer.singleShot(0, lambda: insert_chunk(i + 1))
+                return
+            if i + 1 < len(chunks):
+                insert_chunk(i + 1)
+                return
+            editor.blockSignals(False)
+            editor.setReadOnly(False)
+            editor.setTextCursor(cursor)
+            editor.ensureCursorVisible()
+            editor.textChanged.emit()
+            if progress is not None:
+                progress.close()
+            self.profiler.add("paste_large_text", started, time.perf_counter())
 
-        if format_type == "bold":
-            fmt.setFontWeight(QFont.Weight.Bold if fmt.fontWeight() != QFont.Weight.Bold
-                              else QFont.Weight.Normal)
-        elif format_type == "italic":
-            fmt.setFontItalic(not fmt.fontItalic())
-        elif format_type == "underline":
-            fmt.setFontUnderline(not fmt.fontUnderline())
+        insert_chunk(0)
 
-        cursor.mergeCharFormat(fmt)
-        editor.setCurrentCharFormat(fmt)
+    def undo_action(self):
+        self.sync_visible_sections()
+        command = self.history.undo()
+        if command is not None:
+            self.apply_command(command, undo=True)
+
+    def redo_action(self):
+        self.sync_visible_sections()
+        command = self.history.redo()
+        if command is not None:
+            self.apply_command(command, undo=False)
+
+    def apply_command(self, command, undo):
+        if isinstance(command, history.InsertBlock):
+            # Undoing an insert or redoing a delete removes the block again.
+            if isinstance(command, history.DeleteBlock) == undo:
+                section = self.new_section(command.block)
+                self.insert_section(command.index, section)
+                self.scroll_to_section(section)
+            else:
+                self.remove_section(command.index)
+        elif isinstance(command, history.MoveBlock):
+            self.shift_section(command.block_id, -command.direction if undo else command.direction)
+            self.scroll_to_section(self.sections[self.section_index[command.block_id]])
+        else:
+            section = self.sections[self.section_index[command.block_id]]
+            node = section.node
+            setattr(node, command.field, command.apply(getattr(node, command.field), undo))
+            if command.field == "image_first":
+                self.arrange_section_row(section)
+            elif command.field == "image_name":
+                self.load_section_image(section)
+            else:
+                section.load_node()
+            self.invalidate_section(section)
+            self.scroll_to_section(section)
+            if isinstance(command, history.TextEdit) and command.field == "text" and section.text_edit is not None:
+                # Put the cursor where the text changed.
+                end = command.start + len(command.removed if undo else command.inserted)
+                cursor = section.text_edit.textCursor()
+                cursor.setPosition(utf16_length(richtext.plain_prefix(node.text, end)))
+                section.text_edit.setTextCursor(cursor)
+        self.update_html()
 
-    def _paste_plain_text(self, editor):
-        if editor is None:
+    def sync_section(self, section):
+        """ Copy a section's widgets into its node, recording what changed for undo. """
+        node = section.node
+        before = [getattr(node, field) for field in node.fields]
+        section.sync_node()
+        for field, old in zip(node.fields, before):
+            new = getattr(node, field)
+            if new != old and field not in node.derived_fields:
+                self.history.push(history.field_edit(node.id, field, old, new))
+
+    def sync_visible_sections(self):
+        # Records typing that is still waiting for the render timer.
+        for section in self.visible_sections:
+            self.sync_section(section)
+
+    def load_section_image(self, section):
+        image_name = section.node.image_name
+        section.image_path = os.path.join(self.asset_store.directory, image_name) if image_name else ""
+        section.image_widths = self.asset_store.widths(image_name) if image_name else []
+        section.image_summary = ""
+        if section.image_label is not None:
+            section.image_label.setToolTip("")
+            section.image_label.show_placeholder()
+            section.image_label.show_image()
+
+    def scroll_to_section(self, section):
+        self.update_section_offsets()
+        index = self.section_index[section.id]
+        top, bottom = self.section_offsets[index], self.section_offsets[index + 1]
+        scroll_bar = self.scroll_area.verticalScrollBar()
+        if top < scroll_bar.value() or bottom > scroll_bar.value() + self.scroll_area.viewport().height():
+            # Lay out pending spacer changes first, or the scroll bar's range
+            # may still be too short to reach the section.
+            QApplication.sendPostedEvents(None, QEvent.Type.LayoutRequest)
+            scroll_bar.setValue(top)
+        self.refresh_sections()
+
+    def invalidate_section(self, section):
+        section.fragment = None
+
+    def import_image(self, section, source_path):
+        # The job reports back to the section rather than to its label, which
+        # may be released and re-created while the image is being encoded.
+        started = time.perf_counter()
+        section.image_job = self.image_pipeline.submit(
+            lambda future: self.image_imported(section, future, started),
+            self.profiler.wrap("asset_store.add", self.asset_store.add), source_path)
+
+    def image_imported(self, section, future, started):
+        if future is not section.image_job:
+            return  # superseded by a newer image
+        section.image_job = None
+        self.profiler.add("import_image", started, time.perf_counter())
+        try:
+            encoded = future.result()
+        except Exception as e:
+            if section.image_label is not None:
+                section.image_label.show_placeholder()
+            print(f"Error during copy_and_display_image: {e}")
             return
+        section.image_path = encoded.paths[-1]
+        section.image_summary = encoded.summary()
+        section.image_widths = encoded.widths
+        if section.image_label is not None:
+            section.image_label.image_encoded()
+        self.invalidate_section(section)
+        self.update_html()
 
-        clipboard = QApplication.clipboard()
-        editor.insertPlainText(clipboard.text())
-
-    def _paste_to_focused(self):
-        focused = QApplication.focusWidget()
-        if isinstance(focused, (QTextEdit, QLineEdit)) and focused != self.html_edit:  # Only for editable fields
-            clipboard = QApplication.clipboard()
-            focused.insertPlainText(clipboard.text())
-
-    def undo_action(self):
-        self.html_edit.undo()
+    def render_section(self, section):
+        # Widgets own the edited values; copy them into the document model
+        # so rendering itself never touches Qt.
+        self.sync_section(section)
+        return document.render_block(section.node)
 
     def update_html(self):
-        html_content = """
-                        <div class="longdescription__template">
-                            <div class="longdescription__template__row --layout-photo-text">
-                        """
-
+        if not self.html_update_pending:
+            self.html_update_pending = True
+            self.html_update_clock.start()
+        remaining = self.RENDER_MAX_LATENCY_MS - self.html_update_clock.elapsed()
+        self.html_update_timer.start(max(0, min(self.RENDER_IDLE_MS, remaining)))
+
+    def flush_html(self):
+        self.html_update_timer.stop()
+        if self.html_update_pending:
+            self.html_update_pending = False
+            with self.profiler.span("update_html"):
+                self.render_html()
+
+    def render_html(self):
+        fragments = []
+        changed = []
         for section in self.sections:
-            if section[1] == "section":
-                image_label, text_edit, direction = section[2], section[3], section[5]
-
-                text_content = text_edit.toPlainText()
-                lines = text_content.split('\n')
-                html_lines = []
-                current_depth = 0
-                in_paragraph = False
-                paragraph_lines = []
-
-                for line in lines:
-                    line = line.rstrip()
-                    arrows = len(line) - len(line.lstrip('⤷'))
-                    content = line.lstrip('⤷').strip()
-
-                    if arrows > 0:
-                        if paragraph_lines:
-                            html_lines.append(f"<p>{'<br>'.join(paragraph_lines)}</p>")
-                            paragraph_lines = []
-                            in_paragraph = False
-
-                        while current_depth > arrows:
-                            html_lines.append("</ul>")
-                            current_depth -= 1
-
-                        while current_depth < arrows:
-                            html_lines.append("<ul>")
-                            current_depth += 1
-
-                        html_lines.append(f"<li>{content}</li>")
-                    else:
-                        if current_depth > 0:
-                            html_lines.append("</ul>" * current_depth)
-                            current_depth = 0
-                        paragraph_lines.append(line)
-                        in_paragraph = True
-
-                if paragraph_lines:
-                    html_lines.append(f"<p>{'<br>'.join(paragraph_lines)}</p>")
-                elif current_depth > 0:
-                    html_lines.append("</ul>" * current_depth)
-
-                text_html = f"""<div class="longdescription__template__col --text">
-                {''.join(html_lines)}
-                </div>"""
-
-                text_html = f"""<div class="longdescription__template__col --text">
-                {''.join(html_lines)}
-                </div>"""
-
-                if image_label.image_path and os.path.isfile(image_label.image_path):
-                    file_name = os.path.basename(image_label.image_path)
-                    image_html = f"""
-                        <div class="longdescription__template__col --photo">
-                            <img src="/data/include/cms/img-longdescription/{file_name}" alt="Obraz">
-                        </div>
-                    """
-                else:
-                    image_html = ""
-
-                if direction:
-                    html_content += f"""
-                        <div class="row">
-                            {image_html}
-                            {text_html}
-                        </div>
-                    """
-                else:
-                    html_content += f"""
-                        <div class="row">
-                            {text_html}
-                            {image_html}
-                        </div>
-                    """
-
-            elif section[1] == "header":
-                header_combobox, header_text_edit = section[2], section[3]
-
-                header_type = header_combobox.currentText()
-                header_content = header_text_edit.toPlainText()
-
-                html_content += f"""
-                    <{header_type}>{header_content}</{header_type}>
-                """
-
-            elif section[1] == "youtube":
-                video_id_edit, thumbnail_url, alt_text = section[2], section[3], section[4]
-
-                video_id = video_id_edit.text().strip()
-                # thumbnail_url = thumbnail_url_edit.text().strip()
-                # alt_text = alt_text_edit.text().strip()
-
-                if video_id :
-                    youtube_html = f"""
-                    <div class="longdescription__template__row --video">
-                        <div class="youtube-player">
-                            <div data-id="{video_id}" data-type="youtube-video">
-                                <img src="{thumbnail_url}" alt="{alt_text}">
-                                <span class="youtube-player__button">
-                                    <svg xmlns="http://www.w3.org/2000/svg" height="40px" viewBox="0 -960 960 960" width="40px" fill="#e3e3e3"><path d="m380-300 280-180-280-180v360ZM480-80q-83 0-156-31.5T197-197q-54-54-85.5-127T80-480q0-83 31.5-156T197-763q54-54 127-85.5T480-880q83 0 156 31.5T763-763q54 54 85.5 127T880-480q0 83-31.5 156T763-197q-54 54-127 85.5T480-80Zm0-80q134 0 227-93t93-227q0-134-93-227t-227-93q-134 0-227 93t-93 227q0 134 93 227t227 93Zm0-320Z"/></svg>
-                                </span>
-                            </div>
-                        </div>
-                    </div>
-                    """
-                    html_content += youtube_html
-
-            elif section[1] == "list":
-
-                list_combobox, list_text_edit = section[2], section[3]
-
-                list_type = list_combobox.currentText()
-
-                list_items = list_text_edit.toPlainText().split("\n")
-
-                list_html = f"<div class=\"list_item__col --text\">\n"
-
-                previous_depth = 0
-
-                for item in list_items:
-
-                    stripped_item = item.strip()
-
-                    current_depth = stripped_item.count("⤷")
-
-                    if stripped_item:
-
-                        stripped_item = stripped_item.replace("⤷", "").strip()
-
-                        if current_depth == 0:
-
-                            if previous_depth > 0:
-                                list_html += f"{' ' * (4 * previous_depth)}</{list_type}>\n" * previous_depth
+            if section.fragment is None:
+                section.fragment = self.render_section(section)
+                changed.append(section.node)
+            fragments.append(section.fragment)
 
-                                previous_depth = 0
+        self.profiler.count("sections rendered", len(changed))
+        self.journal.record(changed, [section.id for section in self.sections])
+        patched = self.patch_html_edit(document.assemble_document(fragments))
 
-                            list_html += f"<p>{stripped_item}</p>\n"
-
-
-                        else:
-
-                            if previous_depth == 0:
-
-                                list_html += f"<{list_type} class=\"list_item__list\">\n"
-
-                            elif current_depth > previous_depth:
-
-                                list_html += f"{' ' * (4 * previous_depth)}<{list_type}>\n" * (
-                                            current_depth - previous_depth)
+        self.fragment_bounds = {}
+        offset = len(document.DOCUMENT_HEAD)
+        for section in self.sections:
+            self.fragment_bounds[section.id] = (offset, offset + len(section.fragment))
+            offset += len(section.fragment)
+        self.mark_fragment()
+        if self.fold_checkbox.isChecked() and patched is not None:
+            self.fold_html_edit([patched])
+        self.sync_preview()
+
+    def patch_html_edit(self, html_content):
+        # Replace only the changed range instead of calling setPlainText, which
+        # re-lays-out the whole document, resets scrolling and clears undo history.
+        previous = self.rendered_html
+        prefix, removed, inserted = history.text_delta(previous, html_content)
+        if not removed and not inserted:
+            return None
 
-                            elif current_depth < previous_depth:
+        start = utf16_length(previous[:prefix])
+        end = start + utf16_length(removed)
 
-                                list_html += f"{' ' * (4 * (current_depth + 1))}</{list_type}>\n" * (
-                                            previous_depth - current_depth)
+        cursor = QTextCursor(self.html_edit.document())
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+        cursor.beginEditBlock()
+        cursor.insertText(inserted)
+        cursor.endEditBlock()
 
-                            list_html += f"{' ' * (4 * current_depth)}<li>{stripped_item}</li>\n"
+        self.rendered_html = html_content
+        return start, start + utf16_length(inserted)
 
-                            previous_depth = current_depth
+    def focus_changed(self, old, now):
+        # Focusing any widget of a section, e.g. by clicking into its text,
+        # shows that section's HTML in the output pane.
+        if now is None:
+            return
+        for section in self.visible_sections:
+            if section.row.isAncestorOf(now):
+                if section.id != self.revealed_section_id:
+                    hidden = self.fragment_range(self.revealed_section_id)
+                    self.revealed_section_id = section.id
+                    if self.fold_checkbox.isChecked():
+                        self.fold_html_edit([positions for positions in (hidden, self.fragment_range(section.id))
+                                             if positions is not None])
+                    self.mark_fragment(scroll=True)
+                return
 
-                if previous_depth > 0:
-                    list_html += f"{' ' * (4 * previous_depth)}</{list_type}>\n" * previous_depth
+    def fragment_range(self, section_id):
+        """ Positions in html_edit of the section's fragment without its surrounding blank lines, or None. """
+        bounds = self.fragment_bounds.get(section_id)
+        if bounds is None:
+            return None
+        start, end = bounds
+        fragment = self.rendered_html[start:end]
+        start += len(fragment) - len(fragment.lstrip())
+        end -= len(fragment) - len(fragment.rstrip())
+        if start >= end:
+            return None  # e.g. a YouTube section without a video renders nothing
+        start_position = utf16_length(self.rendered_html[:start])
+        return start_position, start_position + utf16_length(self.rendered_html[start:end])
+
+    def mark_fragment(self, scroll=False):
+        positions = self.fragment_range(self.revealed_section_id)
+        if positions is None:
+            self.html_edit.setExtraSelections([])
+            return
+        cursor = QTextCursor(self.html_edit.document())
+        cursor.setPosition(positions[1])
+        cursor.setPosition(positions[0], QTextCursor.MoveMode.KeepAnchor)
+        selection = QTextEdit.ExtraSelection()
+        selection.cursor = cursor
+        selection.format.setBackground(QColor(themes.HIGHLIGHT[self.light_mode]["fragment"]))
+        self.html_edit.setExtraSelections([selection])
+        if scroll:
+            cursor.clearSelection()
+            self.html_edit.setTextCursor(cursor)
+            self.html_edit.centerCursor()
+
+    def fold_html_edit(self, ranges=None):
+        """ Hide the HTML of all sections except the revealed one while folding is on.
+
+        With ranges, only the lines overlapping those (start, end) positions are
+        updated, e.g. the ones a patch replaced; the rest keep their visibility.
+        """
+        html_document = self.html_edit.document()
+        shown = None
+        if self.fold_checkbox.isChecked() and self.fragment_bounds:
+            positions = self.fragment_range(self.revealed_section_id)
+            first_start = utf16_length(document.DOCUMENT_HEAD)
+            tail_start = html_document.characterCount() - 1 - utf16_length(document.DOCUMENT_TAIL)
+            shown = [(0, first_start), (tail_start, html_document.characterCount())]
+            if positions is not None:
+                shown.append(positions)
+
+        dirty_start = dirty_end = None
+        for range_start, range_end in ranges or [(0, html_document.characterCount())]:
+            block = html_document.findBlock(range_start)
+            while block.isValid() and block.position() <= range_end:
+                start = block.position()
+                end = start + block.length() - 1
+                visible = shown is None or any(start <= shown_end and end >= shown_start
+                                               for shown_start, shown_end in shown)
+                if block.isVisible() != visible:
+                    block.setVisible(visible)
+                    dirty_start = start if dirty_start is None else min(dirty_start, start)
+                    dirty_end = end if dirty_end is None else max(dirty_end, end)
+                block = block.next()
+        if dirty_start is not None:
+            html_document.markContentsDirty(dirty_start, dirty_end - dirty_start + 1)
+            self.html_edit.viewport().update()
+        if shown is not None and ranges is None:
+            self.mark_fragment(scroll=True)
+
+    class ArrowTextEdit(richtext.RichTextEdit):
+        """ Text edit where Tab at the start of a line nests it one level deeper with ⤷. """
+        # Emitted instead of inserting a paste of at least LARGE_PASTE_CHARS.
+        large_paste = pyqtSignal(str)
+
+        def insertFromMimeData(self, source):
+            if source.hasText() and len(source.text()) >= HtmlEditor.LARGE_PASTE_CHARS:
+                self.large_paste.emit(source.text())
+            else:
+                super().insertFromMimeData(source)
 
-                list_html += "</div>\n"
+        def keyPressEvent(self, event):
+            if event.key() != Qt.Key.Key_Tab:
+                super().keyPressEvent(event)
+                return
 
-                html_content += list_html
+            cursor = self.textCursor()
+            current_line = cursor.block().text()
+            cursor_pos_in_block = cursor.positionInBlock()
 
-        html_content += """
-            </div>
-        </div>
-        """
+            if cursor_pos_in_block == 0 or (cursor_pos_in_block > 0 and current_line[
+                                                                        :cursor_pos_in_block].strip() == "⤷" * cursor_pos_in_block):
 
-        self.html_edit.setPlainText(html_content)
+                red_format = QTextCharFormat()
+                red_format.setForeground(QColor("red"))
+                cursor.insertText("⤷", red_format)
+                cursor.setCharFormat(QTextCharFormat())
+                self.setTextCursor(cursor)
+            else:
+                cursor.insertText("    ")
 
     class DraggableLabel(QLabel):
-        def __init__(self, editor=None):
+        def __init__(self, editor, section):
             super().__init__(editor)
             self.editor = editor
+            self.section = section
             self.setText("Przeciągnij obraz tutaj lub kliknij, aby wybrać plik")
             self.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.setStyleSheet("border: 2px dashed gray; padding: 20px; background-color: #444; color: white;")
             self.setAcceptDrops(True)
-            self.image_path = ""
-            self.target_directory = self.create_directory_on_start()
+            self.thumbnail_job = None
             self.confirmation_mode = False
             self.confirmation_widget = None
             self.show_red_x = False
 
-        def create_directory_on_start(self):
-            desktop_path = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.DesktopLocation)
-            directory_name = "Zdjecia Opisow Dlugich"
-            target_directory = os.path.join(desktop_path, directory_name)
-            if not os.path.exists(target_directory):
-                os.makedirs(target_directory)
-            return target_directory
+        def show_image(self):
+            """ Show the section's current image, e.g. when the label is re-created after scrolling. """
+            if self.section.image_job is not None:
+                self.setText("Przetwarzanie obrazu...")
+            elif self.section.image_path and not os.path.isfile(self.section.image_path):
+                self.thumbnail_job = None
+                self.setPixmap(QPixmap())
+                self.setText(f"Brak pliku obrazu:\n{os.path.basename(self.section.image_path)}")
+                self.setToolTip(self.section.image_path)
+            elif self.section.image_path:
+                self.setToolTip(self.section.image_summary)
+                self.show_thumbnail(self.section.image_path)
+
+        def show_placeholder(self):
+            self.thumbnail_job = None
+            self.setPixmap(QPixmap())
+            self.setText("Przeciągnij obraz tutaj lub kliknij, aby wybrać plik")
 
         def mousePressEvent(self, event):
             if self.confirmation_mode:
                 return
 
             if event.button() == Qt.MouseButton.LeftButton:
-                if self.image_path:
+                if self.section.image_path:
                     self.enable_confirmation_mode()
                 else:
                     file_dialog = QFileDialog()
                     desktop_path = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.DesktopLocation)
                     file_dialog.setDirectory(desktop_path)
                     file_dialog.setNameFilter("Images (*.png *.jpg *.jpeg *.bmp *.gif *.webp)")
+                    file_dialog.setFileMode(QFileDialog.FileMode.ExistingFiles)
                     if file_dialog.exec():
-                        selected_file = file_dialog.selectedFiles()
-                        if selected_file:
-                            self.copy_and_display_image(selected_file[0])
+                        self.add_images(file_dialog.selectedFiles())
+
+        def add_images(self, paths):
+            """ The first image goes into this section, the others into new sections right after it. """
+            if paths:
+                self.copy_and_display_image(paths[0])
+                self.editor.import_images(paths[1:], after=self.section)
+
+        def dragEnterEvent(self, event):
+            if not self.confirmation_mode and self.editor.image_paths(event.mimeData()):
+                event.acceptProposedAction()
+
+        def dropEvent(self, event):
+            event.acceptProposedAction()
+            self.add_images(self.editor.image_paths(event.mimeData()))
 
         def enable_confirmation_mode(self):
             if not self.confirmation_widget:
@@ -1747,14 +2114,16 @@ class HtmlEditor(QMainWindow):
 
         def delete_image(self):
             try:
-                if not self.image_path or not os.path.isfile(self.image_path):
+                if not self.section.image_path:
                     return
-                self.image_path = ""
+                self.section.image_path = ""
+                self.section.image_summary = ""
+                self.setToolTip("")
                 self.setPixmap(QPixmap())
                 self.setText("Przeciągnij obraz tutaj lub kliknij, aby wybrać plik")
-                self.setStyleSheet("border: 2px dashed gray; padding: 20px; background-color: #444; color: white;")
                 self.cancel_confirmation_mode()
                 if self.editor and hasattr(self.editor, "update_html"):
+                    self.editor.invalidate_section(self.section)
                     self.editor.update_html()
             except Exception as e:
                 print(f"Error during delete_image: {e}")
@@ -1763,31 +2132,54 @@ class HtmlEditor(QMainWindow):
             try:
                 if not os.path.isfile(source_path):
                     return
-                original_name = os.path.basename(source_path)
-                random_digits = random.randint(1000, 9999)
-                new_file_name = f"{os.path.splitext(original_name)[0]}_{random_digits}.webp"
-                custom_folder = os.path.join("data", "include", "cms", "img-longdescription")
-                os.makedirs(custom_folder, exist_ok=True)
-                destination_path = os.path.join(custom_folder, new_file_name)
-                shutil.copy(source_path, destination_path)
-                destination_path = os.path.join(self.target_directory, new_file_name)
-                shutil.copy(source_path, destination_path)
-                self.image_path = destination_path
-                self.setPixmap(QPixmap(self.image_path).scaled(300, 300, Qt.AspectRatioMode.KeepAspectRatio))
-                self.show_red_x = False
-                self.confirmation_mode = False
-                if self.editor and hasattr(self.editor, "update_html"):
-                    self.editor.update_html()
+                with self.editor.profiler.span("copy_and_display_image"):
+                    self.setPixmap(QPixmap())
+                    self.setText("Przetwarzanie obrazu...")
+                    self.show_thumbnail(source_path)
+                    self.editor.import_image(self.section, source_path)
             except Exception as e:
                 print(f"Error during copy_and_display_image: {e}")
 
+        def show_thumbnail(self, path, use_cache=True):
+            cache = self.editor.thumbnail_cache
+            self.thumbnail_job = self.editor.image_pipeline.submit(
+                lambda future: self.display_thumbnail(future, path),
+                self.editor.profiler.wrap("read_thumbnail", images.read_thumbnail), path,
+                images.THUMBNAIL_SIZE, cache if use_cache else ())
+
+        def display_thumbnail(self, future, path):
+            if future is not self.thumbnail_job:
+                return
+            self.thumbnail_job = None
+            try:
+                digest, image = future.result()
+                pixmap = self.editor.thumbnail_cache.get(digest)
+                if pixmap is None:
+                    if image is None:
+                        # Evicted between the worker's lookup and now; decode it after all.
+                        self.show_thumbnail(path, use_cache=False)
+                        return
+                    pixmap = QPixmap.fromImage(image)
+                    self.editor.thumbnail_cache.put(digest, pixmap)
+                self.setPixmap(pixmap)
+            except Exception as e:
+                print(f"Error during display_thumbnail: {e}")
+
+        def image_encoded(self):
+            self.setToolTip(self.section.image_summary)
+            self.show_red_x = False
+            self.confirmation_mode = False
+            if self.pixmap().isNull() and self.thumbnail_job is None:
+                # Re-created while encoding, so there is no thumbnail of the source yet.
+                self.show_thumbnail(self.section.image_path)
+
         def enterEvent(self, event):
-            if self.image_path and not self.confirmation_mode:
+            if self.section.image_path and not self.confirmation_mode:
                 self.show_red_x = True
                 self.update()
 
         def leaveEvent(self, event):
-            if self.image_path and not self.confirmation_mode:
+            if self.section.image_path and not self.confirmation_mode:
                 self.show_red_x = False
                 self.update()
 
@@ -1810,9 +2202,25 @@ class HtmlEditor(QMainWindow):
 
 
 if __name__ == "__main__":
-    import sys
+    trace = StartupTrace("--startup-trace" in sys.argv)
+    trace.mark("imports")
 
+    # Required before QApplication for QtWebEngineWidgets to be importable later.
+    QCoreApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
+    trace.mark("QApplication")
+
     window = HtmlEditor()
+    window.profiler.enabled = "--profile" in sys.argv
+    trace.mark("HtmlEditor()")
     window.show()
+    trace.mark("HtmlEditor.show()")
+
+    def first_frame():
+        trace.mark("first event loop pass")
+        trace.report()
+        if HtmlEditor.PREVIEW_PREWARM_MS:
+            QTimer.singleShot(HtmlEditor.PREVIEW_PREWARM_MS, window.prewarm_preview)
+
+    QTimer.singleShot(0, first_frame)
     sys.exit(app.exec())
\ No newline at end of file
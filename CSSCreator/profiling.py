@@ -0,0 +1,138 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+# Hot-path instrumentation that can be switched on while the editor runs.
+# While disabled, span() hands out one shared no-op object, so instrumented
+# code pays for a single attribute check.
+
+SAMPLES_PER_OPERATION = 1000
+MAX_TRACE_EVENTS = 200_000
+
+
+def percentile(sorted_values, fraction):
+    """ Nearest-rank percentile of an already sorted, non-empty list. """
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Span:
+    __slots__ = ("profiler", "name", "started")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(self.name, self.started, time.perf_counter())
+        return False
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Profiler:
+    """ Durations per operation plus a bounded log of trace events.
+
+    Only the last samples_per_operation durations of each operation are kept
+    for the percentiles and only the last max_events events for the trace, so
+    leaving it on in a long session costs a fixed amount of memory.
+    """
+
+    def __init__(self, samples_per_operation=SAMPLES_PER_OPERATION, max_events=MAX_TRACE_EVENTS):
+        self.enabled = False
+        self.samples_per_operation = samples_per_operation
+        self.origin = time.perf_counter()
+        self.durations = {}
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.events = deque(maxlen=max_events)
+        self.thread_names = {}
+        # add() and count() are also called from worker threads, e.g. through wrap().
+        self.lock = threading.Lock()
+
+    def span(self, name):
+        """ Context manager timing its body as one call of the operation name. """
+        return Span(self, name) if self.enabled else NULL_SPAN
+
+    def wrap(self, name, function):
+        """ function timed as name, e.g. to measure a job on a worker thread. """
+        def timed(*args, **kwargs):
+            with self.span(name):
+                return function(*args, **kwargs)
+        return timed
+
+    def add(self, name, started, ended):
+        """ Record one call of name, e.g. of an operation that started and ended in different callbacks. """
+        if not self.enabled:
+            return
+        thread = threading.current_thread()
+        with self.lock:
+            samples = self.durations.get(name)
+            if samples is None:
+                samples = self.durations[name] = deque(maxlen=self.samples_per_operation)
+            samples.append(ended - started)
+            self.calls[name] += 1
+            self.thread_names[thread.ident] = thread.name
+            self.events.append(("X", name, started, ended - started, thread.ident))
+
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] += amount
+            self.events.append(("C", name, time.perf_counter(), self.counters[name], threading.get_ident()))
+
+    def stats(self):
+        """ (name, calls, p50, p95, max) per operation, in seconds, sorted by name. """
+        with self.lock:
+            snapshot = [(name, self.calls[name], list(samples)) for name, samples in self.durations.items()]
+        rows = []
+        for name, calls, values in sorted(snapshot):
+            values.sort()
+            if values:
+                rows.append((name, calls, percentile(values, 0.5), percentile(values, 0.95), values[-1]))
+        return rows
+
+    def clear(self):
+        with self.lock:
+            self.durations.clear()
+            self.calls.clear()
+            self.counters.clear()
+            self.events.clear()
+
+    def export_chrome_trace(self, path):
+        """ Write the recorded events in the Trace Event Format read by chrome://tracing and Perfetto. """
+        pid = os.getpid()
+        with self.lock:
+            thread_names = list(self.thread_names.items())
+            events = list(self.events)
+        trace_events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                        for tid, name in thread_names]
+        for phase, name, started, value, tid in events:
+            event = {"name": name, "ph": phase, "ts": (started - self.origin) * 1e6, "pid": pid, "tid": tid}
+            if phase == "X":
+                event["dur"] = value * 1e6
+            else:
+                event["args"] = {"value": value}
+            trace_events.append(event)
+
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, file)
+        os.replace(f"{path}.tmp", path)
@@ -0,0 +1,201 @@
+import re
+
+from PyQt6.QtGui import QFont, QTextBlockUserData, QTextCharFormat, QTextCursor
+from PyQt6.QtWidgets import QTextEdit
+
+import document
+
+# Bold, italic and underline typed in the section editors are kept in the
+# document model as inline <strong>, <em> and <u> tags in the block's text,
+# which the renderer already passes through like any other HTML the user
+# writes. Tags never cross a line, and the leading ⤷ of a line stay outside
+# them so the nesting parser still sees them.
+
+BOLD = 1
+ITALIC = 2
+UNDERLINE = 4
+TAGS = {BOLD: "strong", ITALIC: "em", UNDERLINE: "u"}
+TAG_PATTERN = re.compile(r"<(/?)(strong|em|u)>")
+TAG_FLAGS = {tag: flag for flag, tag in TAGS.items()}
+BOLD_WEIGHT = QFont.Weight.DemiBold.value
+
+
+def prefix_length(text):
+    """ Length of the leading whitespace and ⤷ of a line, which are never formatted. """
+    return len(text) - len(text.lstrip().lstrip(document.ARROW_PREFIX_CHARS))
+
+
+def emit_line(runs):
+    """ Markup for one line given as (text, flags) runs; the tags are opened in TAGS order and closed innermost first. """
+    if not any(flags for _, flags in runs):
+        return "".join(text for text, _ in runs)
+
+    prefix = prefix_length("".join(text for text, _ in runs))
+    parts = []
+    stack = []
+    for text, flags in runs:
+        if prefix:
+            parts.append(text[:prefix])
+            text, prefix = text[prefix:], max(prefix - len(text), 0)
+        if not text:
+            continue
+        keep = 0
+        while keep < len(stack) and stack[keep] & flags:
+            keep += 1
+        for flag in reversed(stack[keep:]):
+            parts.append(f"</{TAGS[flag]}>")
+        del stack[keep:]
+        for flag in TAGS:
+            if flags & flag and flag not in stack:
+                stack.append(flag)
+                parts.append(f"<{TAGS[flag]}>")
+        parts.append(text)
+    for flag in reversed(stack):
+        parts.append(f"</{TAGS[flag]}>")
+    return "".join(parts)
+
+
+def parse_line(line):
+    """ (text, flags) runs of a line, or None if its tags aren't exactly what emit_line would write.
+
+    Anything else, e.g. an unclosed <strong> the user typed, stays literal text,
+    so loading a line into an editor and reading it back never changes it.
+    """
+    if "<" not in line:
+        return [(line, 0)]
+    runs = []
+    stack = []
+    flags = 0
+    position = 0
+    for match in TAG_PATTERN.finditer(line):
+        runs.append((line[position:match.start()], flags))
+        position = match.end()
+        flag = TAG_FLAGS[match.group(2)]
+        if not match.group(1):
+            if flags & flag:
+                return None
+            stack.append(flag)
+        elif not stack or stack.pop() != flag:
+            return None
+        flags ^= flag
+    if stack:
+        return None
+    runs.append((line[position:], 0))
+    return runs if emit_line(runs) == line else None
+
+
+def plain_prefix(text, end):
+    """ The editor's plain text in front of position end of the marked-up text. """
+    start = text.rfind("\n", 0, end) + 1
+    line_end = text.find("\n", end)
+    line = text[start:] if line_end < 0 else text[start:line_end]
+    column = end - start
+
+    lines = []
+    for previous in text[:start].split("\n")[:-1]:
+        runs = parse_line(previous)
+        lines.append(previous if runs is None else "".join(run for run, _ in runs))
+
+    if parse_line(line) is None:
+        lines.append(line[:column])
+    else:
+        lines.append(TAG_PATTERN.sub("", line[:column]))
+    return "\n".join(lines)
+
+
+class LineCache(QTextBlockUserData):
+    def __init__(self, line):
+        super().__init__()
+        self.line = line
+
+
+class RichTextEdit(QTextEdit):
+    """ Text edit read and written as text with <strong>/<em>/<u> markup instead of plain text. """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # The markup of each block is cached on the block. A block's revision
+        # doesn't change when only its formatting does, so the cache is dropped
+        # for every block an edit touches instead.
+        self.document().contentsChange.connect(self.forget_lines)
+
+    def forget_lines(self, position, removed, added):
+        block = self.document().findBlock(position)
+        end = position + added
+        while block.isValid() and block.position() <= end:
+            block.setUserData(None)
+            block = block.next()
+
+    def marked_text(self):
+        if not self.has_formatting():
+            return self.toPlainText()
+        lines = []
+        block = self.document().firstBlock()
+        while block.isValid():
+            cache = block.userData()
+            if cache is None:
+                cache = LineCache(self.block_markup(block))
+                block.setUserData(cache)
+            lines.append(cache.line)
+            block = block.next()
+        return "\n".join(lines)
+
+    def has_formatting(self):
+        # The document's format table only grows until the text is replaced, so
+        # this is a quick check that usually spares walking the blocks.
+        return any(text_format.isCharFormat() and format_flags(text_format.toCharFormat())
+                   for text_format in self.document().allFormats())
+
+    @staticmethod
+    def block_markup(block):
+        runs = []
+        fragments = block.begin()
+        while not fragments.atEnd():
+            fragment = fragments.fragment()
+            # Same characters toPlainText() would give.
+            runs.append((fragment.text().replace("\u00a0", " "), format_flags(fragment.charFormat())))
+            fragments += 1
+
+        if not any("\u2028" in text for text, _ in runs):
+            return emit_line(runs)
+        # Shift+Enter line breaks inside a block become lines of their own.
+        lines = [[]]
+        for text, flags in runs:
+            for i, piece in enumerate(text.split("\u2028")):
+                if i:
+                    lines.append([])
+                lines[-1].append((piece, flags))
+        return "\n".join(emit_line(line) for line in lines)
+
+    def set_marked_text(self, text):
+        if "<" not in text:
+            self.setPlainText(text)
+            return
+
+        self.setPlainText("")
+        cursor = QTextCursor(self.document())
+        cursor.beginEditBlock()
+        for i, line in enumerate(text.split("\n")):
+            if i:
+                cursor.insertBlock()
+            for run, flags in parse_line(line) or [(line, 0)]:
+                cursor.insertText(run, char_format(flags))
+        cursor.endEditBlock()
+        self.setCurrentCharFormat(QTextCharFormat())
+
+
+def format_flags(char_format):
+    return ((BOLD if char_format.fontWeight() >= BOLD_WEIGHT else 0)
+            | (ITALIC if char_format.fontItalic() else 0)
+            | (UNDERLINE if char_format.fontUnderline() else 0))
+
+
+def char_format(flags):
+    char_format = QTextCharFormat()
+    if flags & BOLD:
+        char_format.setFontWeight(QFont.Weight.Bold)
+    if flags & ITALIC:
+        char_format.setFontItalic(True)
+    if flags & UNDERLINE:
+        char_format.setFontUnderline(True)
+    return char_format
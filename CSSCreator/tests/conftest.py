@@ -0,0 +1,39 @@
+import json
+import os
+import sys
+
+import pytest
+
+# The modules live next to main.py rather than in a package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+@pytest.fixture(scope="session")
+def qt_app():
+    from PyQt6.QtCore import QCoreApplication, Qt
+    from PyQt6.QtWidgets import QApplication
+    QCoreApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def editor(qt_app, tmp_path, monkeypatch):
+    """ An HtmlEditor on its editor page, with settings, autosave and assets in tmp_path. """
+    import main
+    monkeypatch.chdir(tmp_path)
+    with open(main.HtmlEditor.SETTINGS_FILE, "w", encoding="utf-8") as file:
+        json.dump({"light_mode": False}, file)
+    window = main.HtmlEditor()
+    window.asset_store.mirror_directory = None
+    window.show()
+    window.show_editor_page()
+    qt_app.processEvents()
+    yield window
+    window.image_pipeline.shutdown()
+    window.paste_pipeline.shutdown()
+    window.asset_store.shutdown()
+    window.journal.close()
+    window.hide()
+    window.deleteLater()
+    qt_app.processEvents()
@@ -0,0 +1,34 @@
+import io
+import json
+import os
+
+import pytest
+
+import batch
+
+
+def write_document(path, text, name=None):
+    data = {"blocks": [{"kind": "header", "tag": "h2", "text": text}]}
+    if name is not None:
+        data["name"] = name
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+
+
+def test_duplicate_output_names_fail_instead_of_overwriting(tmp_path):
+    source = tmp_path / "src"
+    source.mkdir()
+    write_document(source / "a.json", "pierwszy", name="kask")
+    write_document(source / "b.json", "drugi", name="KASK")
+    failures = batch.render_batch(str(source), str(tmp_path / "out"), workers=1, log=io.StringIO())
+    assert [name for name, error in failures] == ["b"]
+    assert os.listdir(tmp_path / "out") == ["kask.html"]
+    assert "pierwszy" in (tmp_path / "out" / "kask.html").read_text(encoding="utf-8")
+
+
+def test_missing_source_is_a_usage_error(tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        batch.main([str(tmp_path / "nope"), str(tmp_path / "out")])
+    assert exit_info.value.code == 2
+    assert "does not exist" in capsys.readouterr().err
+    assert not (tmp_path / "out").exists()
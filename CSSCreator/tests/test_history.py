@@ -0,0 +1,24 @@
+import document
+import history
+
+
+def test_size_of_an_insert_does_not_follow_later_edits():
+    log = history.History(max_bytes=1000, coalesce_seconds=0)
+    block = document.Section("")
+    log.push(history.InsertBlock(0, block))
+    block.text = "x" * 100_000
+    for _ in range(30):
+        log.push(history.MoveBlock(block.id, 1))
+    assert log.size == sum(command.size() for command in log.undo_stack)
+    assert 0 < log.size <= log.max_bytes
+
+
+def test_undo_and_redo_keep_the_size_in_step():
+    log = history.History(coalesce_seconds=0)
+    block = document.Section("abc")
+    log.push(history.InsertBlock(0, block))
+    log.push(history.field_edit(block.id, "text", "abc", "abcdef"))
+    log.undo()
+    block.text = "y" * 1000
+    log.push(history.MoveBlock(block.id, 1))  # drops the undone edit
+    assert log.size == sum(command.size() for command in log.undo_stack)
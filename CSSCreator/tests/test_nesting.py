@@ -0,0 +1,167 @@
+import random
+import time
+
+import document
+
+
+# The renderers render_nesting replaced, kept to check the output didn't change.
+
+def old_section_text(text):
+    html_lines = []
+    current_depth = 0
+    paragraph_lines = []
+    for line in text.split("\n"):
+        line = line.rstrip()
+        arrows = len(line) - len(line.lstrip("⤷"))
+        content = line.lstrip("⤷").strip()
+        if arrows > 0:
+            if paragraph_lines:
+                html_lines.append(f"<p>{'<br>'.join(paragraph_lines)}</p>")
+                paragraph_lines = []
+            while current_depth > arrows:
+                html_lines.append("</ul>")
+                current_depth -= 1
+            while current_depth < arrows:
+                html_lines.append("<ul>")
+                current_depth += 1
+            html_lines.append(f"<li>{content}</li>")
+        else:
+            if current_depth > 0:
+                html_lines.append("</ul>" * current_depth)
+                current_depth = 0
+            paragraph_lines.append(line)
+    if paragraph_lines:
+        html_lines.append(f"<p>{'<br>'.join(paragraph_lines)}</p>")
+    elif current_depth > 0:
+        html_lines.append("</ul>" * current_depth)
+    return "".join(html_lines)
+
+
+def old_list_text(text, list_type):
+    list_html = ""
+    previous_depth = 0
+    for item in text.split("\n"):
+        stripped_item = item.strip()
+        current_depth = stripped_item.count("⤷")
+        if stripped_item:
+            stripped_item = stripped_item.replace("⤷", "").strip()
+            if current_depth == 0:
+                if previous_depth > 0:
+                    list_html += f"{' ' * (4 * previous_depth)}</{list_type}>\n" * previous_depth
+                    previous_depth = 0
+                list_html += f"<p>{stripped_item}</p>\n"
+            else:
+                if previous_depth == 0:
+                    list_html += f"<{list_type} class=\"list_item__list\">\n"
+                elif current_depth > previous_depth:
+                    list_html += f"{' ' * (4 * previous_depth)}<{list_type}>\n" * (current_depth - previous_depth)
+                elif current_depth < previous_depth:
+                    list_html += f"{' ' * (4 * (current_depth + 1))}</{list_type}>\n" * (previous_depth - current_depth)
+                list_html += f"{' ' * (4 * current_depth)}<li>{stripped_item}</li>\n"
+                previous_depth = current_depth
+    if previous_depth > 0:
+        list_html += f"{' ' * (4 * previous_depth)}</{list_type}>\n" * previous_depth
+    return list_html
+
+
+def section_text(text):
+    return document.render_nesting(text, document.SectionTextWriter())
+
+
+def list_text(text, list_type="ul"):
+    return document.render_nesting(text, document.ListTextWriter(list_type), skip_blank=True)
+
+
+def well_formed_text(rng, lines, from_paragraph_max=4):
+    """ Arrows only at the very start of a line; a list opens at most from_paragraph_max levels at once. """
+    words = ["Wymiary", "120 mm", "<strong>IP65</strong>", "stal", "kolor: czarny", "  ", ""]
+    result = []
+    depth = 0
+    for _ in range(lines):
+        if rng.random() < 0.3:
+            depth = 0
+        else:
+            depth = rng.randint(1, depth + 2 if depth else from_paragraph_max)
+        content = " ".join(rng.choice(words) for _ in range(rng.randint(0, 3)))
+        result.append("⤷" * depth + content + rng.choice(["", " ", "  "]))
+    return "\n".join(result)
+
+
+def test_section_output_matches_the_old_renderer():
+    rng = random.Random(19)
+    for _ in range(2000):
+        text = well_formed_text(rng, rng.randint(0, 12))
+        assert section_text(text) == old_section_text(text), text
+
+
+def test_list_output_matches_the_old_renderer():
+    rng = random.Random(20)
+    for _ in range(2000):
+        text = well_formed_text(rng, rng.randint(0, 12), from_paragraph_max=1)
+        for list_type in ("ul", "ol"):
+            assert list_text(text, list_type) == old_list_text(text, list_type), text
+
+
+def test_list_jump_of_several_levels_opens_every_level():
+    html = list_text("a\n⤷⤷⤷b\nc")
+    assert html == ('<p>a</p>\n<ul class="list_item__list">\n    <ul>\n    <ul>\n'
+                    '            <li>b</li>\n            </ul>\n            </ul>\n            </ul>\n<p>c</p>\n')
+    assert html.count("<ul") == html.count("</ul>")
+
+
+def test_only_leading_arrows_nest():
+    assert list_text("a ⤷ b") == "<p>a ⤷ b</p>\n"
+    assert section_text("y ⤷ z") == "<p>y ⤷ z</p>"
+    # whitespace before and between the leading arrows is ignored
+    assert section_text("  ⤷ ⤷x") == "<ul><ul><li>x</li></ul></ul>"
+    assert list_text(" ⤷ ⤷c", "ol") == '<ol class="list_item__list">\n    <ol>\n        <li>c</li>\n        </ol>\n        </ol>\n'
+
+
+def best_time(function, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def ladder(depth):
+    """ Down to depth one level at a time, back up in one jump, and down again. """
+    steps = "\n".join("⤷" * level + f"x{level}" for level in range(1, depth + 1))
+    return f"{steps}\nkoniec\n{steps}"
+
+
+def test_deep_section_nesting():
+    depth = 5000
+    html = section_text(ladder(depth))
+    assert html.count("<li>") == 2 * depth
+    assert html.count("<ul>") == html.count("</ul>") == 2 * depth
+    assert best_time(section_text, ladder(depth)) < 5
+
+    jumps = "\n".join(["⤷" * depth + "x", "y"] * 200)
+    assert section_text(jumps).count("<ul>") == 200 * depth
+    assert best_time(section_text, jumps) < 5
+
+
+def test_deep_list_nesting():
+    # List lines are indented by their depth, so the output itself grows
+    # with the square of the depth; the time has to follow its size only.
+    depth = 1000
+    html = list_text(ladder(depth))
+    assert html.count("<li>") == 2 * depth
+    assert html.count("<ul") == html.count("</ul>") == 2 * depth
+    ratio = best_time(list_text, ladder(2 * depth)) / best_time(list_text, ladder(depth))
+    assert ratio < 8, ratio  # 4 like the output size
+
+
+def test_long_input_scales_linearly():
+    rng = random.Random(21)
+    text = well_formed_text(rng, 20_000, from_paragraph_max=1)
+    long_text = "\n".join([text] * 4)
+    for render in (section_text, list_text):
+        ratio = best_time(render, long_text) / best_time(render, text)
+        assert ratio < 8, ratio  # 4 when linear, 16 when quadratic
+
+    line = "⤷" + "słowo " * 1_000_000
+    assert best_time(section_text, line) < 2
@@ -0,0 +1,60 @@
+import time
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtTest import QTest
+from PyQt6.QtWidgets import QApplication, QMessageBox, QProgressDialog
+
+import document
+
+
+def focus_section_text(editor, qt_app, text):
+    editor.set_blocks([document.Section(text)])
+    editor.flush_html()
+    text_edit = editor.sections[0].text_edit
+    editor.activateWindow()
+    text_edit.setFocus()
+    text_edit.moveCursor(text_edit.textCursor().MoveOperation.End)
+    qt_app.processEvents()
+    assert QApplication.focusWidget() is text_edit
+    return text_edit
+
+
+def paste_with_ctrl_shift_v(text_edit, qt_app, text):
+    QApplication.clipboard().setText(text)
+    QTest.keyClick(QApplication.focusWidget(), Qt.Key.Key_V,
+                   Qt.KeyboardModifier.ControlModifier | Qt.KeyboardModifier.ShiftModifier)
+    # Held read-only while the text is normalized on the worker
+    assert text_edit.isReadOnly()
+
+    deadline = time.monotonic() + 10
+    while text_edit.isReadOnly() and time.monotonic() < deadline:
+        qt_app.processEvents()
+        time.sleep(0.01)
+    assert not text_edit.isReadOnly()
+
+
+def test_ctrl_shift_v_pastes_large_text_as_one_edit(editor, qt_app):
+    text_edit = focus_section_text(editor, qt_app, "Początek ")
+    pasted = "słowo\r\n" * (editor.LARGE_PASTE_CHARS // 6)
+    paste_with_ctrl_shift_v(text_edit, qt_app, pasted)
+    assert text_edit.toPlainText() == "Początek " + document.normalize_pasted_text(pasted)
+    editor.flush_html()
+    assert len(editor.history.undo_stack) == 1
+
+
+def test_failed_normalization_gives_the_editor_back(editor, qt_app, monkeypatch):
+    def fail(text):
+        raise ValueError("zepsuty tekst")
+
+    warnings = []
+    monkeypatch.setattr(document, "normalize_pasted_text", fail)
+    monkeypatch.setattr(QMessageBox, "warning", lambda parent, title, text: warnings.append(text))
+    monkeypatch.setattr(editor, "PASTE_PROGRESS_CHARS", editor.LARGE_PASTE_CHARS)
+    text_edit = focus_section_text(editor, qt_app, "Początek ")
+
+    paste_with_ctrl_shift_v(text_edit, qt_app, "x" * editor.LARGE_PASTE_CHARS)
+    assert text_edit.toPlainText() == "Początek "
+    assert len(warnings) == 1 and "zepsuty tekst" in warnings[0]
+    assert not any(dialog.isVisible() for dialog in editor.findChildren(QProgressDialog))
+    editor.flush_html()
+    assert not editor.history.undo_stack
@@ -0,0 +1,47 @@
+import json
+import sys
+import threading
+
+import profiling
+
+
+def test_concurrent_calls_are_all_counted(tmp_path):
+    # Switch threads as often as possible to provoke lost updates.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    profiler = profiling.Profiler()
+    profiler.enabled = True
+    stop = threading.Event()
+    # All workers run at once, so none reuses the thread id of a finished one.
+    started = threading.Barrier(8)
+
+    def record():
+        started.wait()
+        for _ in range(5000):
+            profiler.add("job", 0.0, 1.0)
+            profiler.count("jobs")
+
+    def export():
+        while not stop.is_set():
+            profiler.export_chrome_trace(str(tmp_path / "trace.json"))
+            profiler.stats()
+
+    try:
+        exporter = threading.Thread(target=export)
+        exporter.start()
+        workers = [threading.Thread(target=record, name=f"worker-{i}") for i in range(8)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        stop.set()
+        exporter.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert profiler.stats()[0][:2] == ("job", 8 * 5000)
+    assert profiler.counters["jobs"] == 8 * 5000
+    profiler.export_chrome_trace(str(tmp_path / "trace.json"))
+    with open(tmp_path / "trace.json", encoding="utf-8") as file:
+        names = {event["args"]["name"] for event in json.load(file)["traceEvents"] if event["ph"] == "M"}
+    assert {f"worker-{i}" for i in range(8)} <= names
@@ -0,0 +1,68 @@
+import os
+
+from PyQt6.QtGui import QColor, QImage
+
+import document
+
+
+def sample_blocks(image_name="", image_widths=()):
+    return [
+        document.Header("h2", "Kask <em>integralny</em>"),
+        document.Section("Opis\n⤷ Skorupa z włókna\n⤷⤷ 1250 g\nKoniec", image_name=image_name,
+                         image_first=False, image_widths=image_widths),
+        document.List("ol", "Pierwszy\n⤷ Drugi\n\n⤷⤷ Trzeci"),
+        document.YoutubeVideo("dQw4w9WgXcQ", "https://img.youtube.com/vi/dQw4w9WgXcQ/0.jpg"),
+    ]
+
+
+def test_save_and_load_renders_identically(tmp_path):
+    blocks = sample_blocks("66b0c1d2e3f4a5b6.webp", [480, 960, 1920])
+    path = tmp_path / "opis.json"
+    document.save_project(path, blocks)
+    loaded = document.load_project(path)
+    assert document.render_document(loaded) == document.render_document(blocks)
+    assert [document.block_to_dict(block) for block in loaded] == [document.block_to_dict(block) for block in blocks]
+
+
+def test_project_without_image_widths_still_loads(tmp_path):
+    data = {"blocks": [{"kind": "section", "text": "t", "image_name": "a.webp", "image_first": True}]}
+    (block,) = document.document_from_dict(data)
+    assert block.image_widths == []
+    assert "srcset" not in document.render_block(block)
+
+
+def test_editor_round_trip(editor, tmp_path):
+    os.makedirs(editor.asset_store.directory)
+    image = QImage(64, 48, QImage.Format.Format_RGB32)
+    image.fill(QColor("red"))
+    image.save(os.path.join(editor.asset_store.directory, "photo.png"))
+    blocks = sample_blocks("photo.png", [32, 64])
+
+    editor.set_blocks(blocks)
+    editor.flush_html()
+    expected = document.render_document(sample_blocks("photo.png", [32, 64]))
+    assert editor.rendered_html == expected
+
+    editor.project_path = str(tmp_path / "opis.json")
+    editor.save_project()
+    editor.set_blocks(document.load_project(editor.project_path))
+    editor.flush_html()
+    assert editor.rendered_html == expected
+    assert not editor.history.undo_stack
+
+
+def test_editor_keeps_missing_images(editor):
+    # e.g. a project opened on another computer, without the image files
+    blocks = sample_blocks("66b0c1d2e3f4a5b6.webp", [480, 1920])
+    editor.set_blocks(blocks)
+    editor.flush_html()
+    assert editor.rendered_html == document.render_document(sample_blocks("66b0c1d2e3f4a5b6.webp", [480, 1920]))
+    section = editor.sections[1]
+    assert section.node.image_name == "66b0c1d2e3f4a5b6.webp"
+    assert section.image_label is not None and "Brak pliku" in section.image_label.text()
+    assert not editor.history.undo_stack
+
+    section.image_label.delete_image()
+    editor.flush_html()
+    assert section.node.image_name == "" and section.node.image_widths == []
+    assert "<img" not in editor.rendered_html.split("youtube-player")[0]
@@ -0,0 +1,180 @@
+# Every themed widget carries a "role" dynamic property and is styled by one
+# stylesheet installed on the main window, so switching themes is a single
+# setStyleSheet call no matter how many sections the document has. Installing
+# it on the window rather than on QApplication avoids re-creating the style of
+# every widget in the application on each switch.
+
+TEMPLATE = """
+* {
+    background-color: %(window)s;
+    color: %(text)s;
+}
+
+QPushButton[role="start"] {
+    background-color: %(primary)s;
+    color: %(button_text)s;
+    padding: 10px;
+    border-radius: 5px;
+}
+
+QPushButton[role="preview"] {
+    background-color: %(preview)s;
+    color: white;
+    padding: 10px;
+    border-radius: 5px;
+}
+
+QPushButton[role="add-section"],
+QPushButton[role="add-header"],
+QPushButton[role="add-list"],
+QPushButton[role="add-youtube"],
+QPushButton[role="copy"],
+QPushButton[role="project"] {
+    background-color: %(primary)s;
+    color: %(button_text)s;
+    padding: 10px;
+    border-radius: 6px;
+    font-size: 14px;
+}
+
+QPushButton[role="add-section"] {
+    background-color: %(add_section)s;
+}
+
+QPushButton[role="add-list"] {
+    background-color: %(add_list)s;
+}
+
+QPushButton[role="add-youtube"] {
+    background-color: %(add_youtube)s;
+}
+
+QPushButton[role="copy"][copied="true"] {
+    background-color: green;
+    color: white;
+}
+
+QPushButton[role="theme-toggle"] {
+    background-color: %(toggle)s;
+    color: %(toggle_text)s;
+    border: none;
+    border-radius: 15px;
+    font-size: 20px;
+}
+
+QPushButton[role="theme-toggle"]:hover {
+    background-color: %(toggle_hover)s;
+}
+
+QPushButton[role="delete"] {
+    background-color: #FF4C4C;
+    color: %(button_text)s;
+    padding: 5px;
+    border-radius: 5px;
+}
+
+QPushButton[role="swap"] {
+    background-color: #FFC107;
+    color: black;
+    padding: 5px;
+    border-radius: 5px;
+}
+
+QPushButton[role="move"] {
+    background-color: %(primary)s;
+    color: %(button_text)s;
+    font-weight: bold;
+    padding: 5px;
+    border-radius: 5px;
+}
+
+QTextEdit[role="editor"],
+QLineEdit[role="editor"] {
+    background-color: %(field)s;
+    color: %(text)s;
+    border-radius: 5px;
+    padding: 5px;
+}
+
+QLabel[role="drop"] {
+    border: 2px dashed gray;
+    padding: 20px;
+    background-color: %(drop)s;
+    color: %(text)s;
+}
+
+QComboBox[role="picker"] {
+    background-color: %(field)s;
+    color: %(text)s;
+    padding: 10px;
+    font-size: 14px;
+}
+
+QComboBox[role="picker"] QAbstractItemView {
+    background-color: %(popup)s;
+    color: %(text)s;
+    selection-background-color: %(selection)s;
+    selection-color: %(text)s;
+}
+"""
+
+LIGHT = {
+    "window": "white",
+    "text": "black",
+    "button_text": "black",
+    "primary": "#6395ED",
+    "preview": "#6c757d",
+    "add_section": "#198754",
+    "add_list": "orange",
+    "add_youtube": "red",
+    "toggle": "#555555",
+    "toggle_text": "white",
+    "toggle_hover": "#444444",
+    "field": "#e9ecef",
+    "drop": "#e9ecef",
+    "popup": "white",
+    "selection": "#f0f0f0",
+}
+
+DARK = {
+    "window": "#2b2b2b",
+    "text": "white",
+    "button_text": "white",
+    "primary": "#4567BB",
+    "preview": "#495057",
+    "add_section": "#28a745",
+    "add_list": "#e67c00",
+    "add_youtube": "#d32f2f",
+    "toggle": "#cccccc",
+    "toggle_text": "black",
+    "toggle_hover": "#e6e6e6",
+    "field": "#222",
+    "drop": "#444",
+    "popup": "#2b2b2b",
+    "selection": "#444",
+}
+
+STYLESHEETS = {True: TEMPLATE % LIGHT, False: TEMPLATE % DARK}
+
+# Colors of the generated HTML pane; "fragment" marks the section being edited.
+HIGHLIGHT = {
+    True: {"tag": "#800000", "attribute": "#e50000", "string": "#0451a5", "comment": "#008000",
+           "entity": "#8a6d00", "fragment": "#fff3c4"},
+    False: {"tag": "#569cd6", "attribute": "#9cdcfe", "string": "#ce9178", "comment": "#6a9955",
+            "entity": "#d7ba7d", "fragment": "#3a3d41"},
+}
+
+
+def apply_theme(window, light_mode):
+    window.setStyleSheet(STYLESHEETS[light_mode])
+
+
+def set_role(widget, role):
+    widget.setProperty("role", role)
+
+
+def set_state(widget, name, value):
+    """ Change a dynamic property used in a selector and re-polish just this widget. """
+    widget.setProperty(name, value)
+    widget.style().unpolish(widget)
+    widget.style().polish(widget)